@@ -0,0 +1,383 @@
+import argparse
+
+from os import path
+import contextlib
+import io
+import json
+import multiprocessing
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+
+from typing import Callable, Dict, List
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from formats.dat import Dat
+from formats.map.sbf import BlockedSectors
+from formats.map.sec import Sector, SectorFlyweights
+from formats.map.tdf import Terrain, TerrainHeader
+from generate_corpus import Constants as CorpusConstants, generate_corpus
+
+import main as validation
+
+
+"""
+Benchmarks the hot paths of the formats on a synthetic corpus (see generate_corpus.py).
+Every benchmark runs in a fresh process, so its peak RSS is its own, and the results are saved as json so that runs
+of different commits can be compared (see --compare).
+"""
+
+
+Runner = Callable[[], None]
+
+
+def get_map_directory(corpus_directory: str) -> str:
+    return path.join(corpus_directory, CorpusConstants.maps_folder, CorpusConstants.map_name)
+
+
+def get_terrain_file_path(corpus_directory: str, sector_pointers_type: int) -> str:
+
+    for terrain_file_path in glob(path.join(corpus_directory, CorpusConstants.terrain_folder, "*",
+                                            CorpusConstants.terrain_file_name)):
+        with open(terrain_file_path, "rb") as terrain_file:
+            if TerrainHeader.read_from(terrain_file).sector_pointers_type == sector_pointers_type:
+                return terrain_file_path
+
+    raise FileNotFoundError("The corpus has no terrain with pointers type %X" % sector_pointers_type)
+
+
+def get_sector_file_paths(corpus_directory: str) -> List[str]:
+    return sorted(glob(path.join(get_map_directory(corpus_directory), "*" + CorpusConstants.sector_extension)))
+
+
+def get_dat_file_path(corpus_directory: str) -> str:
+    return path.join(corpus_directory, CorpusConstants.dat_names_template % 1)
+
+
+def dat_open(corpus_directory: str, output_directory: str) -> Runner:
+
+    dat_file_path = get_dat_file_path(corpus_directory)
+
+    return lambda: Dat.open(dat_file_path).close()
+
+
+def dat_sequential_getitem(corpus_directory: str, output_directory: str) -> Runner:
+
+    dat = Dat.open(get_dat_file_path(corpus_directory))
+    names = dat.keys_by_location()
+
+    def run() -> None:
+        for name in names:
+            dat[name]
+
+    return run
+
+
+def dat_random_getitem(corpus_directory: str, output_directory: str) -> Runner:
+
+    dat = Dat.open(get_dat_file_path(corpus_directory))
+    names = list(dat.keys())
+    random.Random(0).shuffle(names)
+
+    def run() -> None:
+        for name in names:
+            dat[name]
+
+    return run
+
+
+def get_terrain_benchmarks(sector_pointers_type: int) -> Dict[str, Callable[[str, str], Runner]]:
+
+    def terrain_read(corpus_directory: str, output_directory: str) -> Runner:
+
+        terrain_file_path = get_terrain_file_path(corpus_directory, sector_pointers_type)
+
+        return lambda: Terrain.read(terrain_file_path)
+
+    def terrain_read_lazy(corpus_directory: str, output_directory: str) -> Runner:
+
+        terrain_file_path = get_terrain_file_path(corpus_directory, sector_pointers_type)
+
+        return lambda: Terrain.read(terrain_file_path, lazy=True)
+
+    def terrain_write(corpus_directory: str, output_directory: str) -> Runner:
+
+        terrain = Terrain.read(get_terrain_file_path(corpus_directory, sector_pointers_type))
+        output_file_path = path.join(output_directory, CorpusConstants.terrain_file_name)
+
+        return lambda: terrain.write(output_file_path)
+
+    return {"terrain_read": terrain_read, "terrain_read_lazy": terrain_read_lazy, "terrain_write": terrain_write}
+
+
+def sector_read(corpus_directory: str, output_directory: str) -> Runner:
+
+    sector_file_paths = get_sector_file_paths(corpus_directory)
+
+    def run() -> None:
+        for sector_file_path in sector_file_paths:
+            Sector.read(sector_file_path)
+
+    return run
+
+
+def sector_read_shared(corpus_directory: str, output_directory: str) -> Runner:
+    """ Reads every sector twice through a store of shared tiles and roofs, like two maps on the same terrain """
+
+    sector_file_paths = get_sector_file_paths(corpus_directory)
+
+    def run() -> None:
+
+        flyweights = SectorFlyweights()
+
+        for sector_file_path in sector_file_paths * 2:
+            Sector.read(sector_file_path, flyweights=flyweights)
+
+    return run
+
+
+def sector_write(corpus_directory: str, output_directory: str) -> Runner:
+
+    sectors = [Sector.read(sector_file_path) for sector_file_path in get_sector_file_paths(corpus_directory)]
+    output_file_path = path.join(output_directory, "sector" + CorpusConstants.sector_extension)
+
+    def run() -> None:
+        for sector in sectors:
+            sector.write(output_file_path)
+
+    return run
+
+
+def blocked_sectors_round_trip(corpus_directory: str, output_directory: str) -> Runner:
+
+    blocked_sectors_file_path = path.join(get_map_directory(corpus_directory),
+                                          CorpusConstants.blocked_sectors_file_name)
+    output_file_path = path.join(output_directory, CorpusConstants.blocked_sectors_file_name)
+
+    return lambda: BlockedSectors.read(blocked_sectors_file_path).write(output_file_path)
+
+
+def validate_directory(corpus_directory: str, output_directory: str) -> Runner:
+    """ Validates the map directory just like main.py does, reading and then writing every sector """
+
+    map_directory = get_map_directory(corpus_directory)
+    output_file_path = path.join(output_directory, "validated" + CorpusConstants.sector_extension)
+
+    def run() -> None:
+
+        validated_objects = []
+        validation.validate_files(map_directory, validated_objects)
+
+        for validated_object in validated_objects:
+            validated_object.write(output_file_path)
+
+    return run
+
+
+def get_benchmarks() -> Dict[str, Callable[[str, str], Runner]]:
+
+    benchmarks = {
+        "dat_open": dat_open,
+        "dat_sequential_getitem": dat_sequential_getitem,
+        "dat_random_getitem": dat_random_getitem,
+    }
+
+    sector_pointers_types = (
+        ("no_pointers", TerrainHeader.SectorPointersType.no_pointers),
+        ("simple_pointers", TerrainHeader.SectorPointersType.simple_pointers),
+        ("compressed_pointers", TerrainHeader.SectorPointersType.compressed_pointers),
+    )
+
+    for type_name, sector_pointers_type in sector_pointers_types:
+        for name, benchmark in get_terrain_benchmarks(sector_pointers_type).items():
+            benchmarks["%s_%s" % (name, type_name)] = benchmark
+
+    benchmarks.update({
+        "sector_read": sector_read,
+        "sector_read_shared": sector_read_shared,
+        "sector_write": sector_write,
+        "blocked_sectors_round_trip": blocked_sectors_round_trip,
+        "validate_directory": validate_directory,
+    })
+
+    return benchmarks
+
+
+def run_benchmark(name: str, corpus_directory: str, repeats: int) -> dict:
+    """ Runs in a process of its own, times the benchmark and then measures its allocations and peak RSS """
+
+    output_directory = tempfile.mkdtemp()
+
+    try:
+        # The parsers print while parsing, which is not what is measured
+        with contextlib.redirect_stdout(io.StringIO()):
+
+            run = get_benchmarks()[name](corpus_directory, output_directory)
+
+            # Warm up (e.g. the page cache)
+            run()
+
+            wall_times = []
+            for _ in range(repeats):
+                start_time = time.perf_counter()
+                run()
+                wall_times.append(time.perf_counter() - start_time)
+
+            # Measured apart, since tracing slows everything down
+            tracemalloc.start()
+            run()
+            allocated_size, allocated_peak_size = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    finally:
+        shutil.rmtree(output_directory, ignore_errors=True)
+
+    if resource is not None:
+        # Kilobytes on linux, but bytes on macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_rss *= 1 if sys.platform == "darwin" else 1024
+    else:
+        peak_rss = None
+
+    return {
+        "repeats": repeats,
+        "wall_time_min": min(wall_times),
+        "wall_time_median": statistics.median(wall_times),
+        "allocated_bytes": allocated_size,
+        "allocated_peak_bytes": allocated_peak_size,
+        "peak_rss_bytes": peak_rss,
+    }
+
+
+def get_commit() -> str:
+
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=path.dirname(path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare_results(results: dict, baseline: dict, threshold: float) -> bool:
+    """ Prints the change of every benchmark compared to the baseline, returns False if any of them regressed """
+
+    success = True
+
+    for name, result in results["benchmarks"].items():
+
+        baseline_result = baseline["benchmarks"].get(name)
+        if baseline_result is None:
+            continue
+
+        ratio = result["wall_time_min"] / max(baseline_result["wall_time_min"], 1e-12)
+        regressed = ratio > 1 + threshold
+        success = success and not regressed
+
+        print("%-40s %8.3fx%s" % (name, ratio, "  REGRESSION" if regressed else ""))
+
+    return success
+
+
+def main(corpus_directory: str, names: List[str], repeats: int, output_file_path: str, baseline_file_path: str,
+         threshold: float, corpus_arguments: dict) -> bool:
+
+    temporary_corpus_directory = None
+
+    if not corpus_directory:
+        corpus_directory = temporary_corpus_directory = tempfile.mkdtemp()
+        print("Generating corpus in '%s'..." % corpus_directory, file=sys.stderr)
+        generate_corpus(output_directory=corpus_directory, **corpus_arguments)
+
+    benchmarks = get_benchmarks()
+    names = [name for name in benchmarks if not names or any(filter_name in name for filter_name in names)]
+
+    results = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": corpus_arguments,
+        "benchmarks": {},
+    }
+
+    # A fresh process for every benchmark, so the peak RSS of one does not hide another
+    context = multiprocessing.get_context("spawn")
+
+    try:
+        for name in names:
+
+            print("Running '%s'..." % name, file=sys.stderr)
+
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_benchmark, name, corpus_directory, repeats).result()
+
+            results["benchmarks"][name] = result
+
+            print("\t%.4f s (min of %d), %d bytes allocated at peak, %s bytes peak RSS" %
+                  (result["wall_time_min"], repeats, result["allocated_peak_bytes"], result["peak_rss_bytes"]),
+                  file=sys.stderr)
+
+    finally:
+        if temporary_corpus_directory:
+            shutil.rmtree(temporary_corpus_directory, ignore_errors=True)
+
+    if output_file_path:
+        with open(output_file_path, "w") as output_file:
+            json.dump(results, output_file, indent=1)
+    else:
+        json.dump(results, sys.stdout, indent=1)
+        print()
+
+    if baseline_file_path:
+        with open(baseline_file_path, "r") as baseline_file:
+            return compare_results(results, json.load(baseline_file), threshold=threshold)
+
+    return True
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmarks the Arcanum formats on a synthetic corpus.')
+    parser.add_argument('names', nargs='*', help='Only run the benchmarks whose names contain any of these')
+    parser.add_argument('--corpus', help='An existing corpus directory (see generate_corpus.py), by default a '
+                                         'temporary corpus is generated', default='')
+    parser.add_argument('--repeats', help='Number of timed runs of every benchmark', type=int, default=5)
+    parser.add_argument('--output', help='The json results file path (by default printed to stdout)', default='')
+    parser.add_argument('--compare', help='A json results file of a former run to compare with', default='')
+    parser.add_argument('--threshold', help='The slowdown (as a fraction) over which a benchmark is considered '
+                                            'a regression when comparing', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--world-size', type=int, default=256)
+    parser.add_argument('--map-sectors', type=int, default=64)
+    parser.add_argument('--terrain-size', type=int, default=256)
+    parser.add_argument('--dat-entries', type=int, default=2000)
+    parser.add_argument('--dat-entry-size', type=int, default=16 * 1024)
+
+    arguments = parser.parse_args()
+
+    corpus_arguments = {
+        "seed": arguments.seed,
+        "world_rows": arguments.world_size,
+        "world_cols": arguments.world_size,
+        "map_sectors": arguments.map_sectors,
+        "terrain_size": arguments.terrain_size,
+        "dat_entries": arguments.dat_entries,
+        "max_dat_entry_size": arguments.dat_entry_size,
+    }
+
+    success = main(corpus_directory=arguments.corpus, names=arguments.names, repeats=arguments.repeats,
+                   output_file_path=arguments.output, baseline_file_path=arguments.compare,
+                   threshold=arguments.threshold, corpus_arguments=corpus_arguments)
+
+    sys.exit(0 if success else 1)
@@ -0,0 +1,91 @@
+from formats.dat import Dat
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from typing import Dict, Iterable, List, Union
+
+
+class AsyncDat(object):
+    """
+    Wraps a Dat for asyncio code, reading and inflating entries runs on a pool of 'max_workers' threads so that the
+    event loop is never blocked by the disk or by zlib.
+    Concurrent reads of the same entry share a single read, and entries can be prefetched in the background (they are
+    held until they are read, so only prefetch what is going to be read).
+    """
+
+    def __init__(self, dat: Dat, max_workers: int=4):
+
+        self.dat = dat
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        self.in_flight = {}  # type: Dict[str, asyncio.Future]
+        self.prefetched = {}  # type: Dict[str, asyncio.Future]
+
+    @classmethod
+    async def open(cls, dat_file_path: str, max_workers: int=4, **dat_open_arguments) -> "AsyncDat":
+
+        loop = asyncio.get_running_loop()
+
+        dat = await loop.run_in_executor(None, functools.partial(Dat.open, dat_file_path, **dat_open_arguments))
+
+        return AsyncDat(dat=dat, max_workers=max_workers)
+
+    async def close(self) -> None:
+
+        loop = asyncio.get_running_loop()
+
+        await loop.run_in_executor(None, self.executor.shutdown)
+
+        self.dat.close()
+
+    async def __aenter__(self) -> "AsyncDat":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.dat
+
+    def keys(self) -> Iterable[str]:
+        return self.dat.keys()
+
+    async def read(self, name: str) -> Union[bytes, memoryview]:
+
+        future = self.prefetched.pop(name, None) or self.in_flight.get(name) or self._schedule(name)
+
+        # Shielded so that a cancelled reader does not cancel the read for the others waiting on it
+        return await asyncio.shield(future)
+
+    async def read_many(self, names: Iterable[str]) -> List[Union[bytes, memoryview]]:
+        return await asyncio.gather(*(self.read(name) for name in names))
+
+    def prefetch(self, names: Iterable[str]) -> None:
+        """ Hints that the entries are going to be read soon, so they are read in the background """
+
+        for name in names:
+            if name not in self.prefetched:
+                self.prefetched[name] = self.in_flight.get(name) or self._schedule(name)
+
+    def _schedule(self, name: str) -> asyncio.Future:
+
+        loop = asyncio.get_running_loop()
+
+        future = loop.run_in_executor(self.executor, self.dat.__getitem__, name)
+
+        self.in_flight[name] = future
+        future.add_done_callback(functools.partial(self._on_read_done, name))
+
+        return future
+
+    def _on_read_done(self, name: str, future: asyncio.Future) -> None:
+
+        if self.in_flight.get(name) is future:
+            del self.in_flight[name]
+
+        # Marks the exception as retrieved, it is raised to whoever reads the entry
+        if not future.cancelled():
+            future.exception()
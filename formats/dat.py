@@ -1,9 +1,18 @@
 from formats.helpers import FileStruct
 import io
+import mmap
+import os
+import re
+import threading
+import uuid
 import zlib
-from collections import OrderedDict
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from fnmatch import translate
 
-from typing import Dict, Iterable
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 
 class DatFooter(object):
@@ -35,6 +44,11 @@ class DatFooter(object):
         return DatFooter(guid=guid, marker=marker, file_names_size=file_names_size,
                          footer_plus_entries_size=footer_plus_entries_size)
 
+    def write_to(self, dat_file: io.FileIO) -> None:
+
+        self.parser.pack_into_file(dat_file, self.guid, self.marker, self.file_names_size,
+                                   self.footer_plus_entries_size)
+
     @property
     def marker(self) -> str:
         return self.Constants.marker
@@ -43,6 +57,7 @@ class DatFooter(object):
 class DatEntry(object):
 
     class Flags(object):
+        is_uncompressed = 0x001
         is_compressed = 0x002
         is_directory = 0x400
 
@@ -57,6 +72,7 @@ class DatEntry(object):
 
     def __init__(self, flags: int, full_size: int, compressed_size: int, location: int):
 
+        self.flags = flags
         self.is_compressed = bool(flags & self.Flags.is_compressed)
         self.is_directory = bool(flags & self.Flags.is_directory)
         self.full_size = full_size
@@ -71,21 +87,609 @@ class DatEntry(object):
         return DatEntry(flags=flags, full_size=full_size, compressed_size=compressed_size, location=location)
 
 
-class Dat(object):
+class DatIndex(Mapping):
+    """
+    A read only mapping of file name to DatEntry that is backed by packed array columns instead of holding a DatEntry
+    object per file, the entries are only created when they are looked up.
+
+    Binary file format (starting 'footer_plus_entries_size' bytes before the end of the dat):
+    - Number of entries (4 bytes)
+    - Entry * Number of entries:
+        - File name length (4 bytes), including the null terminator
+        - File name (File name length bytes)
+        - DatEntry (20 bytes)
+    - DatFooter (28 bytes)
+
+    The parsed index can also be saved to (and loaded from) a cache file, which is only valid for the dat file with
+    the same guid, size and modification time.
+    Binary cache file format (native byte order, the cache is not meant to be moved between machines):
+    - Marker "DIDX" (4 bytes)
+    - Version (4 bytes)
+    - Dat guid (16 bytes)
+    - Dat file size (8 bytes)
+    - Dat modification time in nanoseconds (8 bytes)
+    - Number of entries (4 bytes)
+    - Names size (4 bytes)
+    - Flags, full sizes, compressed sizes and locations (4 bytes * Number of entries each)
+    - Names, separated by null bytes (Names size bytes)
+    """
 
     number_of_entries_parser = FileStruct("<I")
     file_name_length_parser = FileStruct("<I")
 
-    def __init__(self, dat_file: io.FileIO, footer: DatFooter, name_to_entry: Dict[str, DatEntry]):
+    column_type_code = "I"
+
+    cache_marker = b"DIDX"
+    cache_version = 1
+    cache_header_parser = FileStruct("=4sI16sQQII")
+
+    def __init__(self, names: List[str], flags: array, full_sizes: array, compressed_sizes: array, locations: array):
+
+        self.names = names
+
+        self.flags = flags
+        self.full_sizes = full_sizes
+        self.compressed_sizes = compressed_sizes
+        self.locations = locations
+
+        # Same semantics as filling a dict entry by entry, the first position is kept and the last entry wins.
+        self.name_to_index = {name: index for index, name in enumerate(names)}  # type: Dict[str, int]
+
+    @classmethod
+    def read_from(cls, dat_file: io.FileIO, footer: DatFooter) -> "DatIndex":
+
+        dat_file.seek(-footer.footer_plus_entries_size, io.SEEK_END)
+
+        # The entries are parsed from a single read instead of reading every field from the file
+        raw_data = dat_file.read(footer.footer_plus_entries_size - DatFooter.parser.size)
+
+        return cls.unpack_from(raw_data)
+
+    @classmethod
+    def unpack_from(cls, raw_data: bytes) -> "DatIndex":
+
+        number_of_entries, = cls.number_of_entries_parser.unpack_from(raw_data, 0)
+        offset = cls.number_of_entries_parser.size
+
+        names = []  # type: List[str]
+        flags = array(cls.column_type_code)
+        full_sizes = array(cls.column_type_code)
+        compressed_sizes = array(cls.column_type_code)
+        locations = array(cls.column_type_code)
+
+        unpack_file_name_length = cls.file_name_length_parser.unpack_from
+        unpack_entry = DatEntry.parser.unpack_from
+        file_name_length_size = cls.file_name_length_parser.size
+        entry_size = DatEntry.parser.size
+
+        for _ in range(number_of_entries):
+
+            file_name_length, = unpack_file_name_length(raw_data, offset)
+            offset += file_name_length_size
+
+            names.append(raw_data[offset:offset + file_name_length - 1].decode())  # without the null byte
+            offset += file_name_length
+
+            entry_flags, full_size, compressed_size, location = unpack_entry(raw_data, offset)
+            offset += entry_size
+
+            flags.append(entry_flags)
+            full_sizes.append(full_size)
+            compressed_sizes.append(compressed_size)
+            locations.append(location)
+
+        return DatIndex(names=names, flags=flags, full_sizes=full_sizes, compressed_sizes=compressed_sizes,
+                        locations=locations)
+
+    def pack(self) -> bytes:
+        """ Packs the entries in the dat format, the opposite of 'unpack_from' (so without the footer) """
+
+        raw_data = [self.number_of_entries_parser.pack(len(self.names))]
+
+        for index, name in enumerate(self.names):
+
+            raw_name = name.encode() + b"\0"
+
+            raw_data.append(self.file_name_length_parser.pack(len(raw_name)))
+            raw_data.append(raw_name)
+            raw_data.append(DatEntry.parser.pack(self.flags[index], self.full_sizes[index],
+                                                 self.compressed_sizes[index], self.locations[index]))
+
+        return b"".join(raw_data)
+
+    @classmethod
+    def read_cache(cls, cache_file_path: str, footer: DatFooter, dat_stat: os.stat_result) -> Optional["DatIndex"]:
+        """ Returns the cached index, or None if there is no valid cache for the dat """
+
+        try:
+            with open(cache_file_path, "rb") as cache_file:
+                raw_data = cache_file.read()
+        except OSError:
+            return None
+
+        if len(raw_data) < cls.cache_header_parser.size:
+            return None
+
+        marker, version, guid, dat_size, dat_mtime, number_of_entries, names_size = \
+            cls.cache_header_parser.unpack_from(raw_data, 0)
+
+        if (marker != cls.cache_marker or version != cls.cache_version or guid != footer.guid or
+                dat_size != dat_stat.st_size or dat_mtime != dat_stat.st_mtime_ns):
+            return None
+
+        columns = []
+        offset = cls.cache_header_parser.size
+
+        for _ in range(4):
+            column = array(cls.column_type_code)
+            column_size = number_of_entries * column.itemsize
+            column.frombytes(raw_data[offset:offset + column_size])
+            columns.append(column)
+            offset += column_size
+
+        raw_names = raw_data[offset:offset + names_size]
+        names = raw_names.decode().split("\0") if number_of_entries else []
+
+        if len(names) != number_of_entries or any(len(column) != number_of_entries for column in columns):
+            return None
+
+        flags, full_sizes, compressed_sizes, locations = columns
+
+        return DatIndex(names=names, flags=flags, full_sizes=full_sizes, compressed_sizes=compressed_sizes,
+                        locations=locations)
+
+    def write_cache(self, cache_file_path: str, footer: DatFooter, dat_stat: os.stat_result) -> None:
+
+        raw_names = "\0".join(self.names).encode()
+
+        header_data = self.cache_header_parser.pack(self.cache_marker, self.cache_version, footer.guid,
+                                                    dat_stat.st_size, dat_stat.st_mtime_ns, len(self.names),
+                                                    len(raw_names))
+
+        # Written aside and then renamed, so concurrent readers never see a partial cache.
+        temporary_file_path = "%s.%d.tmp" % (cache_file_path, os.getpid())
+
+        with open(temporary_file_path, "wb") as cache_file:
+
+            cache_file.write(header_data)
+
+            for column in (self.flags, self.full_sizes, self.compressed_sizes, self.locations):
+                cache_file.write(column.tobytes())
+
+            cache_file.write(raw_names)
+
+        os.replace(temporary_file_path, cache_file_path)
+
+    def entry_at(self, index: int) -> DatEntry:
+
+        return DatEntry(flags=self.flags[index], full_size=self.full_sizes[index],
+                        compressed_size=self.compressed_sizes[index], location=self.locations[index])
+
+    def __getitem__(self, name: str) -> DatEntry:
+        return self.entry_at(self.name_to_index[name])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.name_to_index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.name_to_index)
+
+    def __len__(self) -> int:
+        return len(self.name_to_index)
+
+
+class DatEntryReader(io.RawIOBase):
+    """
+    A read only file like object over a single entry of a dat.
+    Compressed entries are inflated incrementally, so at most 'chunk_size' bytes of compressed data and the
+    requested amount of inflated data are held in memory at once.
+    Seeking is supported in any direction, but seeking backwards in a compressed entry restarts the inflation from the
+    start of the entry (so it is best avoided).
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, dat: "Dat", name: str, entry: DatEntry):
+
+        super().__init__()
+
+        self.dat = dat
+        self.name = name
+        self.entry = entry
+
+        self._restart()
+
+    def _restart(self) -> None:
+
+        self.position = 0
+
+        # Position inside the raw (compressed) data of the entry
+        self.raw_position = 0
+
+        self.decompressor = zlib.decompressobj() if self.entry.is_compressed else None
+
+    @property
+    def size(self) -> int:
+        return 0 if self.entry.is_directory else self.entry.full_size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int=io.SEEK_SET) -> int:
+
+        if whence == io.SEEK_SET:
+            target = offset
+        elif whence == io.SEEK_CUR:
+            target = self.position + offset
+        elif whence == io.SEEK_END:
+            target = self.size + offset
+        else:
+            raise ValueError("Invalid whence (%d)" % whence)
+
+        if target < 0:
+            raise ValueError("Negative seek position %d" % target)
+
+        if self.decompressor is None:
+            self.position = target
+            return self.position
+
+        if target < self.position:
+            self._restart()
+
+        while self.position < min(target, self.size):
+            skipped = self._inflate(min(self.chunk_size, target - self.position))
+            if not skipped:
+                break
+            self.position += len(skipped)
+
+        self.position = target
+
+        return self.position
+
+    def readinto(self, buffer) -> int:
+
+        view = memoryview(buffer).cast("B")
+
+        size = min(len(view), self.size - self.position)
+        if size <= 0:
+            return 0
+
+        if self.decompressor is None:
+            data = self.dat._read_at(self.entry.location + self.position, size)
+            view[:len(data)] = data
+            self.position += len(data)
+            return len(data)
+
+        # Unlike most raw streams this fills the whole buffer unless the entry ends, parsers rely on full reads.
+        read_size = 0
+        while read_size < size:
+            data = self._inflate(size - read_size)
+            if not data:
+                break
+            view[read_size:read_size + len(data)] = data
+            read_size += len(data)
+
+        self.position += read_size
+
+        return read_size
+
+    def _inflate(self, max_length: int) -> bytes:
+        """
+        Only called before the end of the entry, so running out of data (a truncated entry or a stream that inflates
+        to less than the size of the entry) raises zlib.error, just like inflating the whole entry at once does.
+        """
+
+        while True:
+
+            if self.decompressor.unconsumed_tail:
+                raw_data = self.decompressor.unconsumed_tail
+
+            elif self.raw_position < self.entry.compressed_size:
+                raw_size = min(self.chunk_size, self.entry.compressed_size - self.raw_position)
+                raw_data = self.dat._read_at(self.entry.location + self.raw_position, raw_size)
+                self.raw_position += len(raw_data)
+
+                if not raw_data:
+                    raise zlib.error("The compressed data of '%s' is truncated" % self.name)
+
+            elif self.decompressor.eof:
+                raise zlib.error("'%s' inflated to less than its size (%d bytes)" % (self.name, self.entry.full_size))
+
+            else:
+                # All the input was consumed, but the decompressor might still hold some output.
+                data = self.decompressor.decompress(b"", max_length)
+                if not data:
+                    raise zlib.error("Incomplete or truncated stream of '%s'" % self.name)
+                return data
+
+            data = self.decompressor.decompress(raw_data, max_length)
+            if data:
+                return data
+
+
+class DatCache(object):
+    """
+    A LRU cache of entry data (by entry name) that holds at most 'max_size' bytes.
+    Entries of up to 'pin_size' bytes are pinned, they are never evicted and are not counted against 'max_size'.
+    """
+
+    def __init__(self, max_size: int, pin_size: int=0):
+
+        self.max_size = max_size
+        self.pin_size = pin_size
+
+        self.size = 0
+        self.pinned_size = 0
+
+        self.name_to_data = OrderedDict()  # type: Dict[str, bytes]
+        self.pinned_name_to_data = {}  # type: Dict[str, bytes]
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.name_to_data) + len(self.pinned_name_to_data)
+
+    def get(self, name: str) -> Optional[bytes]:
+
+        with self.lock:
+
+            data = self.pinned_name_to_data.get(name)
+
+            if data is None:
+                data = self.name_to_data.get(name)
+                if data is not None:
+                    self.name_to_data.move_to_end(name)
+
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+            return data
+
+    def put(self, name: str, data: bytes) -> None:
+
+        size = len(data)
+
+        with self.lock:
+
+            if name in self.name_to_data or name in self.pinned_name_to_data:
+                return
+
+            if size <= self.pin_size:
+                self.pinned_name_to_data[name] = data
+                self.pinned_size += size
+                return
+
+            if size > self.max_size:
+                return
+
+            while self.size + size > self.max_size:
+                _, evicted_data = self.name_to_data.popitem(last=False)
+                self.size -= len(evicted_data)
+                self.evictions += 1
+
+            self.name_to_data[name] = data
+            self.size += size
+
+    def clear(self) -> None:
+
+        with self.lock:
+
+            self.name_to_data.clear()
+            self.pinned_name_to_data.clear()
+            self.size = 0
+            self.pinned_size = 0
+
+
+class DatDirectory(object):
+    """
+    A node in the directory tree of a dat, holds the full names of its files and its sub directories by their names.
+    """
+
+    separators_pattern = re.compile(r"[\\/]+")
+    magic_pattern = re.compile(r"[*?[]")
+
+    def __init__(self, name: str):
+
+        self.name = name
+
+        self.directories = OrderedDict()  # type: Dict[str, DatDirectory]
+        self.files = OrderedDict()  # type: Dict[str, str]
+
+    @classmethod
+    def build(cls, index: DatIndex) -> "DatDirectory":
+
+        root = DatDirectory(name="")
+
+        for name in index:
+            root.add(name, is_directory=bool(index.flags[index.name_to_index[name]] & DatEntry.Flags.is_directory))
+
+        return root
+
+    def add(self, name: str, is_directory: bool) -> None:
+        """ Adds a file (or a directory) by its full name, along with all of its parent directories """
+
+        *parent_path, base_name = self.split(name)
+
+        directory = self
+        for directory_name in parent_path:
+            directory = directory.get_or_add_directory(directory_name)
+
+        if is_directory:
+            directory.get_or_add_directory(base_name)
+        else:
+            directory.files[base_name] = name
+
+    @classmethod
+    def split(cls, name: str) -> List[str]:
+        return [component for component in cls.separators_pattern.split(name) if component]
+
+    def get_or_add_directory(self, directory_name: str) -> "DatDirectory":
+
+        directory = self.directories.get(directory_name)
+
+        if directory is None:
+            name = self.name + "\\" + directory_name if self.name else directory_name
+            directory = self.directories[directory_name] = DatDirectory(name=name)
+
+        return directory
+
+    def find(self, name: str) -> "DatDirectory":
+
+        directory = self
+        for directory_name in self.split(name):
+            directory = directory.directories[directory_name]
+
+        return directory
+
+    def walk(self) -> Iterator[Tuple[str, List[str], List[str]]]:
+        """ Just like os.walk, yields the name, sub directory names and file names of this and every sub directory """
+
+        yield self.name, list(self.directories), list(self.files)
+
+        for directory in self.directories.values():
+            yield from directory.walk()
+
+    def yield_names(self) -> Iterator[str]:
+        """ Yields the full names of all the files and directories under this directory """
+
+        for directory in self.directories.values():
+            yield directory.name
+            yield from directory.yield_names()
+
+        yield from self.files.values()
+
+    def match(self, pattern: str) -> List[str]:
+        """ Returns the full names of the files and directories matching the pattern (see 'glob'), without repeats """
+
+        components = self.split(pattern)
+        if not components:
+            return []
+
+        # The same name can be matched more than once by '**' components
+        return list(OrderedDict.fromkeys(self.glob(components)))
+
+    def glob(self, components: List[str]) -> Iterator[str]:
+        """
+        Yields the full names of the files and directories matching the pattern components, only matching sub
+        directories are visited. Wildcards never match a separator, except for a '**' component which matches any
+        number of directories.
+        """
+
+        component, rest = components[0], components[1:]
+
+        if component == "**":
+
+            if not rest:
+                yield from self.yield_names()
+                return
+
+            yield from self.glob(rest)
+            for directory in self.directories.values():
+                yield from directory.glob(components)
+
+        elif not self.magic_pattern.search(component):
+
+            directory = self.directories.get(component)
+
+            if rest:
+                if directory is not None:
+                    yield from directory.glob(rest)
+
+            else:
+                if directory is not None:
+                    yield directory.name
+                if component in self.files:
+                    yield self.files[component]
+
+        else:
+
+            matcher = re.compile(translate(component))
+
+            for directory_name, directory in self.directories.items():
+                if matcher.match(directory_name):
+                    if rest:
+                        yield from directory.glob(rest)
+                    else:
+                        yield directory.name
+
+            if not rest:
+                for file_name, name in self.files.items():
+                    if matcher.match(file_name):
+                        yield name
+
+
+class LazyDatDirectory(object):
+    """ A directory tree that is only built on first use (once, even when it is shared between threads) """
+
+    def __init__(self, build: Callable[[], DatDirectory]):
+
+        self.build = build
+
+        self._tree = None  # type: Optional[DatDirectory]
+        self._tree_lock = threading.Lock()
+
+    def get(self) -> DatDirectory:
+
+        if self._tree is None:
+            with self._tree_lock:
+                if self._tree is None:
+                    self._tree = self.build()
+
+        return self._tree
+
+
+class Dat(object):
+    """
+    When opened with 'use_mmap' the whole archive is mapped into memory, stored entries are returned as memoryview
+    slices of the mapping (no copy at all) and compressed entries are inflated straight out of the mapping.
+    Note that the dat can not be closed while any of those memoryviews is still alive.
+
+    When opened with an 'index_cache_directory' the parsed entry table is saved there, and later opens of the same
+    (unchanged) dat load it from there instead of parsing the table again.
+
+    When opened with a 'cache_size' the inflated data of entries is kept in a DatCache, so repeated requests for the
+    same entry are not read and inflated again (memoryviews of a mapping are never cached since they cost nothing).
+
+    A dat can be shared between threads, reads are positional (os.pread or slices of the mapping) so there is no
+    shared file position, and on platforms without pread (Windows) reads are serialized by a lock instead.
+    The file like objects returned by 'open_entry' have a position of their own, so each should be used by one
+    thread at a time.
+    """
+
+    has_pread = hasattr(os, "pread")
+
+    def __init__(self, dat_file: io.FileIO, footer: DatFooter, name_to_entry: DatIndex,
+                 dat_map: mmap.mmap=None, cache: DatCache=None):
 
         self.dat_file = dat_file
+        self.dat_map = dat_map
+        self.dat_view = memoryview(dat_map) if dat_map is not None else None
 
         self.footer = footer
 
         self.name_to_entry = name_to_entry
 
+        self.cache = cache
+
+        self._tree = LazyDatDirectory(lambda: DatDirectory.build(self.name_to_entry))
+
+        self._seek_lock = threading.Lock()
+
     @classmethod
-    def open(cls, dat_file_path: str) -> "Dat":
+    def open(cls, dat_file_path: str, use_mmap: bool=False, cache_size: int=0, cache_pin_size: int=0,
+             index_cache_directory: str=None) -> "Dat":
 
         dat_file = open(dat_file_path, "rb")
 
@@ -93,39 +697,434 @@ class Dat(object):
 
         footer = DatFooter.read_from(dat_file)
 
-        dat_file.seek(-footer.footer_plus_entries_size, io.SEEK_END)
-        number_of_entries, = cls.number_of_entries_parser.unpack_from_file(dat_file)
+        if index_cache_directory is None:
 
-        name_to_entry = OrderedDict()  # type: Dict[str, DatEntry]
+            name_to_entry = DatIndex.read_from(dat_file, footer)
 
-        for _ in range(number_of_entries):
+        else:
+
+            dat_stat = os.fstat(dat_file.fileno())
+            cache_file_path = cls.get_index_cache_path(dat_file_path, index_cache_directory)
+
+            name_to_entry = DatIndex.read_cache(cache_file_path, footer=footer, dat_stat=dat_stat)
+
+            if name_to_entry is None:
+
+                name_to_entry = DatIndex.read_from(dat_file, footer)
+
+                try:
+                    name_to_entry.write_cache(cache_file_path, footer=footer, dat_stat=dat_stat)
+                except OSError:
+                    pass  # The cache is only an optimization
+
+        if use_mmap:
+            dat_map = mmap.mmap(dat_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            dat_map = None
+
+        if cache_size or cache_pin_size:
+            cache = DatCache(max_size=cache_size, pin_size=cache_pin_size)
+        else:
+            cache = None
+
+        return Dat(dat_file=dat_file, footer=footer, name_to_entry=name_to_entry, dat_map=dat_map, cache=cache)
 
-            file_name_length, = cls.file_name_length_parser.unpack_from_file(dat_file)
-            file_name = dat_file.read(file_name_length - 1).decode()  # we don't want to save the last null
-            dat_file.read(1)  # to skip the null byte
+    @staticmethod
+    def get_index_cache_path(dat_file_path: str, index_cache_directory: str) -> str:
 
-            name_to_entry[file_name] = DatEntry.read_from(dat_file)
+        # The hash of the full path keeps apart dats with the same name (e.g. modules with 'PATCH' files)
+        dat_file_path = os.path.abspath(dat_file_path)
+        dat_file_name = os.path.basename(dat_file_path)
 
-        return Dat(dat_file=dat_file, footer=footer, name_to_entry=name_to_entry)
+        cache_file_name = "%s.%08x.index" % (dat_file_name, zlib.crc32(dat_file_path.encode()))
+
+        return os.path.join(index_cache_directory, cache_file_name)
+
+    def close(self) -> None:
+
+        if self.dat_map is not None:
+            self.dat_view.release()
+            self.dat_map.close()
+
+        self.dat_file.close()
+
+    def __enter__(self) -> "Dat":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
     def __contains__(self, name: str) -> bool:
         return name in self.name_to_entry
 
-    def __getitem__(self, name: str) -> bytes:
+    def __getitem__(self, name: str) -> Union[bytes, memoryview]:
+
+        if self.cache is not None:
+            data = self.cache.get(name)
+            if data is not None:
+                return data
 
         entry = self.name_to_entry[name]
 
         if entry.is_directory:
             return b""
 
-        self.dat_file.seek(entry.location, io.SEEK_SET)
+        return self._unpack(name, entry, self._read_raw(entry))
 
-        raw_data = self.dat_file.read(entry.compressed_size)
+    def _unpack(self, name: str, entry: DatEntry, raw_data: Union[bytes, memoryview]) -> Union[bytes, memoryview]:
 
         if entry.is_compressed:
-            return zlib.decompress(raw_data)
+            data = zlib.decompress(raw_data)
         else:
-            return raw_data
+            data = raw_data
+
+        if self.cache is not None and not isinstance(data, memoryview):
+            self.cache.put(name, data)
+
+        return data
+
+    def read_many(self, names: Iterable[str], ordered: bool=True, jobs: int=None,
+                  max_gap: int=64 * 1024, max_read_size: int=16 * 1024 * 1024
+                  ) -> Iterator[Tuple[str, Union[bytes, memoryview]]]:
+        """
+        Yields the (name, data) of many entries at once, in the requested order or (if not 'ordered') in the order
+        they are ready.
+        The entries are read by their location, and entries that are at most 'max_gap' bytes apart are read together
+        in a single read of up to 'max_read_size' bytes, while inflating is done on a pool of 'jobs' threads.
+        """
+
+        names = list(names)
+
+        name_to_future = OrderedDict()  # type: Dict[str, Future]
+        entries_to_read = []  # type: List[Tuple[str, DatEntry]]
+
+        for name in names:
+
+            if name in name_to_future:
+                continue
+
+            future = name_to_future[name] = Future()
+
+            data = self.cache.get(name) if self.cache is not None else None
+            if data is not None:
+                future.set_result(data)
+                continue
+
+            entry = self.name_to_entry[name]
+
+            if entry.is_directory:
+                future.set_result(b"")
+            else:
+                entries_to_read.append((name, entry))
+
+        entries_to_read.sort(key=lambda name_and_entry: name_and_entry[1].location)
+
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+
+            for run in self._yield_coalesced_runs(entries_to_read, max_gap=max_gap, max_read_size=max_read_size):
+
+                start = run[0][1].location
+                end = max(entry.location + entry.compressed_size for _, entry in run)
+
+                run_data = memoryview(self._read_at(start, end - start))
+
+                for name, entry in run:
+
+                    raw_data = run_data[entry.location - start:entry.location - start + entry.compressed_size]
+
+                    if entry.is_compressed:
+                        future = executor.submit(self._unpack, name, entry, raw_data)
+                        future.add_done_callback(self._get_future_copier(name_to_future[name]))
+                    else:
+                        # Slices of a mapping are returned as is, just like __getitem__ does
+                        if self.dat_view is None:
+                            raw_data = bytes(raw_data)
+                        name_to_future[name].set_result(self._unpack(name, entry, raw_data))
+
+            if ordered:
+                for name in names:
+                    yield name, name_to_future[name].result()
+            else:
+                future_to_name = {future: name for name, future in name_to_future.items()}
+                for future in as_completed(future_to_name):
+                    yield future_to_name[future], future.result()
+
+    @staticmethod
+    def _get_future_copier(target: Future):
+
+        def copy_future(source: Future) -> None:
+            if source.exception() is not None:
+                target.set_exception(source.exception())
+            else:
+                target.set_result(source.result())
+
+        return copy_future
+
+    @staticmethod
+    def _yield_coalesced_runs(entries: List[Tuple[str, DatEntry]], max_gap: int,
+                              max_read_size: int) -> Iterator[List[Tuple[str, DatEntry]]]:
+        """ Groups entries (sorted by location) to runs that are close enough to be read at once """
+
+        run = []  # type: List[Tuple[str, DatEntry]]
+        start = end = 0
+
+        for name, entry in entries:
+
+            entry_end = entry.location + entry.compressed_size
+
+            if run and (entry.location - end > max_gap or max(end, entry_end) - start > max_read_size):
+                yield run
+                run = []
+
+            if not run:
+                start = entry.location
+                end = entry_end
+            else:
+                end = max(end, entry_end)
+
+            run.append((name, entry))
+
+        if run:
+            yield run
+
+    def read_raw(self, name: str) -> Union[bytes, memoryview]:
+        """ Returns the data of the entry as it is stored in the archive, without inflating it """
+
+        entry = self.name_to_entry[name]
+
+        if entry.is_directory:
+            return b""
+
+        return self._read_raw(entry)
+
+    def open_entry(self, name: str) -> io.BufferedReader:
+        """ Returns a read only file like object that streams the (uncompressed) data of the entry """
+
+        entry = self.name_to_entry[name]
+
+        return io.BufferedReader(DatEntryReader(dat=self, name=name, entry=entry),
+                                 buffer_size=DatEntryReader.chunk_size)
+
+    def _read_raw(self, entry: DatEntry) -> Union[bytes, memoryview]:
+        """ Returns the data of the entry as it is stored in the archive (compressed or not) """
+
+        return self._read_at(entry.location, entry.compressed_size)
+
+    def _read_at(self, location: int, size: int) -> Union[bytes, memoryview]:
+        """ Reads without moving a shared file position (except on platforms without pread), so it is thread safe """
+
+        if self.dat_view is not None:
+            return self.dat_view[location:location + size]
+
+        if not self.has_pread:
+            with self._seek_lock:
+                self.dat_file.seek(location, io.SEEK_SET)
+                return self.dat_file.read(size)
+
+        data = os.pread(self.dat_file.fileno(), size, location)
+
+        # pread may return less than requested (e.g. when interrupted), but only returns nothing at the end of file
+        while len(data) < size:
+            part = os.pread(self.dat_file.fileno(), size - len(data), location + len(data))
+            if not part:
+                break
+            data += part
+
+        return data
 
     def keys(self) -> Iterable[str]:
         return self.name_to_entry.keys()
+
+    @property
+    def tree(self) -> DatDirectory:
+        """ The directory tree of the dat, only built on first use """
+
+        return self._tree.get()
+
+    def listdir(self, directory_name: str="") -> List[str]:
+        """ Just like os.listdir, returns the names of the sub directories and files of the directory """
+
+        directory = self.tree.find(directory_name)
+
+        return list(directory.directories) + list(directory.files)
+
+    def walk(self, directory_name: str="") -> Iterator[Tuple[str, List[str], List[str]]]:
+        return self.tree.find(directory_name).walk()
+
+    def glob(self, pattern: str) -> List[str]:
+        """ Returns the full names of all the entries matching the pattern (see DatDirectory.glob) """
+
+        return self.tree.match(pattern)
+
+    def keys_by_location(self) -> List[str]:
+        """ Returns the names of all the entries ordered by their location in the archive """
+
+        index = self.name_to_entry
+        indexes = sorted(index.name_to_index.values(), key=index.locations.__getitem__)
+
+        return [index.names[i] for i in indexes]
+
+
+class DatWriter(object):
+    """
+    Creates dat files from (name, data) pairs or from a directory tree.
+    The data of the files is compressed on a pool of 'jobs' workers (threads by default, since zlib releases the GIL)
+    and every file is only saved compressed if that shrinks it to at most 'max_compression_ratio' of its size.
+    Directory entries are added for all the parent directories of the files, and the entry table is sorted by the
+    lower cased names.
+
+    Binary file format:
+    - Data of the files, one after the other
+    - Entry table and footer (see DatIndex)
+    """
+
+    def __init__(self, jobs: int=None, compression_level: int=zlib.Z_DEFAULT_COMPRESSION,
+                 max_compression_ratio: float=0.95, use_processes: bool=False, guid: bytes=None):
+
+        self.jobs = jobs or os.cpu_count() or 1
+        self.compression_level = compression_level
+        self.max_compression_ratio = max_compression_ratio
+        self.use_processes = use_processes
+        self.guid = guid
+
+    @staticmethod
+    def pack_file_data(data: bytes, compression_level: int, max_compression_ratio: float) -> Tuple[int, bytes]:
+        """ Returns the entry flags and the data to save for the file """
+
+        compressed_data = zlib.compress(data, compression_level)
+
+        if len(compressed_data) <= len(data) * max_compression_ratio:
+            return DatEntry.Flags.is_compressed, compressed_data
+
+        return DatEntry.Flags.is_uncompressed, bytes(data)
+
+    @staticmethod
+    def normalize_name(name: str) -> str:
+        return name.replace("/", "\\").strip("\\")
+
+    @classmethod
+    def yield_directory_files(cls, directory: str) -> Iterator[Tuple[str, bytes]]:
+        """ Yields the relative name and data of every file under the directory, the data is only read when needed """
+
+        for name, file_path in cls._yield_directory_file_names(directory):
+            yield name, cls._read_file(file_path)
+
+    @classmethod
+    def yield_changed_files(cls, base_dat: "Dat", source: Union[str, "Dat"]) -> Iterator[Tuple[str, bytes]]:
+        """
+        Yields only the files of the source (a directory or a newer dat) that were added or changed compared to the
+        base dat (names are compared case insensitively).
+        The sizes are compared first, so the base data is only read and compared for files of the same size.
+        """
+
+        base_lower_name_to_name = {name.lower(): name for name in base_dat.keys()}
+
+        if isinstance(source, Dat):
+            entries = ((name, source.name_to_entry[name]) for name in source.keys_by_location())
+            sources = [(name, entry.full_size, name) for name, entry in entries if not entry.is_directory]
+            read_data = source.__getitem__
+        else:
+            sources = [(name, os.path.getsize(file_path), file_path)
+                       for name, file_path in cls._yield_directory_file_names(source)]
+            read_data = cls._read_file
+
+        for name, full_size, data_source in sources:
+
+            base_name = base_lower_name_to_name.get(name.lower())
+
+            if base_name is None or base_dat.name_to_entry[base_name].full_size != full_size:
+                yield name, read_data(data_source)
+                continue
+
+            data = read_data(data_source)
+            if base_dat[base_name] != data:
+                yield name, data
+
+    @staticmethod
+    def _yield_directory_file_names(directory: str) -> Iterator[Tuple[str, str]]:
+
+        for parent_directory, directory_names, file_names in os.walk(directory):
+
+            # Sorted in place so that the walk (and so the locations in the dat) does not depend on the file system
+            directory_names.sort()
+
+            for file_name in sorted(file_names):
+
+                file_path = os.path.join(parent_directory, file_name)
+
+                yield os.path.relpath(file_path, directory).replace(os.sep, "\\"), file_path
+
+    @staticmethod
+    def _read_file(file_path: str) -> bytes:
+
+        with open(file_path, "rb") as input_file:
+            return input_file.read()
+
+    def write_directory(self, dat_file_path: str, directory: str) -> DatFooter:
+        return self.write(dat_file_path, self.yield_directory_files(directory))
+
+    def write_patch(self, dat_file_path: str, base_dat: "Dat", source: Union[str, "Dat"]) -> DatFooter:
+        """ Writes a dat (usually a '.patch' file) of only the added and changed files, see 'yield_changed_files' """
+
+        return self.write(dat_file_path, self.yield_changed_files(base_dat, source))
+
+    def write(self, dat_file_path: str, files: Iterable[Tuple[str, bytes]]) -> DatFooter:
+
+        pool_type = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+
+        name_to_entry = {}  # type: Dict[str, Tuple[int, int, int, int]]
+
+        with open(dat_file_path, "wb") as dat_file, pool_type(max_workers=self.jobs) as executor:
+
+            for name, full_size, flags, packed_data in self._yield_packed_files(executor, files):
+
+                if name in name_to_entry:
+                    raise ValueError("Duplicate file name '%s'" % name)
+
+                name_to_entry[name] = (flags, full_size, len(packed_data), dat_file.tell())
+                dat_file.write(packed_data)
+
+            directory_entry = (DatEntry.Flags.is_directory, 0, 0, 0)
+            for name in list(name_to_entry):
+                parent_name = name.rpartition("\\")[0]
+                while parent_name and parent_name not in name_to_entry:
+                    name_to_entry[parent_name] = directory_entry
+                    parent_name = parent_name.rpartition("\\")[0]
+
+            names = sorted(name_to_entry, key=str.lower)
+            columns = [array(DatIndex.column_type_code, values) for values in
+                       zip(*(name_to_entry[name] for name in names))] or [array(DatIndex.column_type_code)] * 4
+
+            flags, full_sizes, compressed_sizes, locations = columns
+            index = DatIndex(names=names, flags=flags, full_sizes=full_sizes, compressed_sizes=compressed_sizes,
+                             locations=locations)
+
+            raw_index = index.pack()
+
+            footer = DatFooter(guid=self.guid or uuid.uuid4().bytes, marker=DatFooter.Constants.marker,
+                               file_names_size=sum(len(name.encode()) + 1 for name in names),
+                               footer_plus_entries_size=len(raw_index) + DatFooter.parser.size)
+
+            dat_file.write(raw_index)
+            footer.write_to(dat_file)
+
+        return footer
+
+    def _yield_packed_files(self, executor: Executor,
+                            files: Iterable[Tuple[str, bytes]]) -> Iterator[Tuple[str, int, int, bytes]]:
+        """ Compresses the files on the executor and yields them in order, only a few files are pending at once """
+
+        pending = deque()  # type: Deque
+
+        for name, data in files:
+
+            future = executor.submit(self.pack_file_data, data, self.compression_level, self.max_compression_ratio)
+            pending.append((self.normalize_name(name), len(data), future))
+
+            if len(pending) >= self.jobs * 4:
+                name, full_size, future = pending.popleft()
+                yield (name, full_size) + future.result()
+
+        while pending:
+            name, full_size, future = pending.popleft()
+            yield (name, full_size) + future.result()
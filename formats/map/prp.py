@@ -42,3 +42,10 @@ class MapProperties(object):
         return MapProperties(file_path=map_properties_file_path,
                              original_type=original_type, stamp=stamp,
                              tile_rows=tile_rows, tile_cols=tile_cols)
+
+    def write(self, map_properties_file_path: str) -> None:
+
+        with open(map_properties_file_path, "wb") as map_properties_file:
+
+            self.parser.pack_into_file(map_properties_file, self.original_type, self.stamp, self.tile_rows,
+                                       self.tile_cols)
@@ -1,9 +1,11 @@
 from formats.helpers import FileStruct
 from formats.obj import Object
 
+import hashlib
 import io
+import threading
 
-from typing import List, Any, Tuple
+from typing import Any, Callable, Dict, List, Tuple
 
 
 class SectorLights(object):
@@ -438,6 +440,100 @@ class SectorObjects(object):
         self.length_parser.pack_into_file(sector_file, len(self))
 
 
+class SectorFlyweights(object):
+    """
+    A store of SectorTiles and SectorRoofs shared by content, so that reading tiles (or roofs) that are already held
+    returns the held instance. Most sectors of a world are base terrain sectors, so any number of loaded maps share a
+    single copy of every one of them.
+    Shared instances must never be edited, and every instance read through the store is reference counted: it is held
+    until it is released as many times as it was read.
+    """
+
+    def __init__(self):
+
+        # Content key to [instance, reference count]
+        self.key_to_entry = {}  # type: Dict[Tuple[str, bytes], List[Any]]
+        self.id_to_key = {}  # type: Dict[int, Tuple[str, bytes]]
+
+        self.hits = 0
+        self.misses = 0
+
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.key_to_entry)
+
+    def read_tiles_from(self, sector_file: io.FileIO) -> SectorTiles:
+
+        raw_tiles_data = sector_file.read(SectorTiles.raw_tiles_parser.size)
+
+        return self._acquire(SectorTiles, raw_tiles_data,
+                             lambda: SectorTiles(SectorTiles.raw_tiles_parser.unpack(raw_tiles_data)))
+
+    def read_roofs_from(self, sector_file: io.FileIO) -> SectorRoofs:
+
+        type_data = sector_file.read(SectorRoofs.type_parser.size)
+        type, = SectorRoofs.type_parser.unpack(type_data)
+
+        raw_roofs_data = sector_file.read(SectorRoofs.raw_roofs_parser.size) if type == 0 else b""
+
+        return self._acquire(SectorRoofs, type_data + raw_roofs_data,
+                             lambda: SectorRoofs(type=type, raw_roofs=SectorRoofs.raw_roofs_parser.unpack(
+                                 raw_roofs_data) if type == 0 else ()))
+
+    def release(self, instance: Any) -> None:
+
+        with self.lock:
+
+            key = self.id_to_key[id(instance)]
+            entry = self.key_to_entry[key]
+
+            entry[1] -= 1
+
+            if not entry[1]:
+                del self.key_to_entry[key]
+                del self.id_to_key[id(instance)]
+
+    def release_sector(self, sector: "Sector") -> None:
+        """ Releases the tiles and roofs of a sector that was read through the store """
+
+        self.release(sector.tiles)
+        self.release(sector.roofs)
+
+    def _acquire(self, cls: type, data: bytes, create: Callable[[], Any]) -> Any:
+
+        key = (cls.__name__, hashlib.blake2b(data, digest_size=16).digest())
+
+        with self.lock:
+
+            entry = self.key_to_entry.get(key)
+
+            if entry is not None:
+                entry[1] += 1
+                self.hits += 1
+                return entry[0]
+
+            self.misses += 1
+
+        # Parsed outside of the lock, if another thread parsed the same content meanwhile its instance is used
+        instance = create()
+
+        with self.lock:
+
+            entry = self.key_to_entry.setdefault(key, [instance, 0])
+            entry[1] += 1
+
+            self.id_to_key[id(entry[0])] = key
+
+            return entry[0]
+
+
+"""
+The store of the whole process (see SectorFlyweights)
+"""
+shared_sector_flyweights = SectorFlyweights()
+
+
 class Sector(object):
     """
     Binary file format (everything unsigned unless explicitly mentioned): 
@@ -461,13 +557,23 @@ class Sector(object):
         self.objects = objects
 
     @classmethod
-    def read(cls, sector_file_path: str) -> "Sector":
+    def read(cls, sector_file_path: str, flyweights: SectorFlyweights=None) -> "Sector":
+        """
+        When given 'flyweights' (e.g. 'shared_sector_flyweights') the tiles and roofs are shared with every other
+        sector of the same content read through it, and must be released with 'release_sector' when done with.
+        """
 
         with open(sector_file_path, "rb") as sector_file:
 
             lights = SectorLights.read_from(sector_file)
-            tiles = SectorTiles.read_from(sector_file)
-            roofs = SectorRoofs.read_from(sector_file)
+
+            if flyweights is None:
+                tiles = SectorTiles.read_from(sector_file)
+                roofs = SectorRoofs.read_from(sector_file)
+            else:
+                tiles = flyweights.read_tiles_from(sector_file)
+                roofs = flyweights.read_roofs_from(sector_file)
+
             info = SectorInfo.read_from(sector_file)
             objects = SectorObjects.read_from(sector_file)
 
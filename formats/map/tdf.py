@@ -2,14 +2,18 @@ from formats.helpers import FileStruct
 
 import zlib
 import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-from typing import Dict, Tuple, Union, Iterator
+from typing import Dict, List, Optional, Tuple, Union, Iterator
 
 import numpy
 
 
 # Used for type checking only
-NumpyMatrix = Union[Dict[Tuple[int, int], int], numpy.ndarray, None]
+NumpyMatrix = Union[Dict[Tuple[int, int], int], numpy.ndarray, "LazyCompressedSectorPointers", None]
 
 
 """
@@ -93,17 +97,34 @@ class TerrainHeader(object):
 
     def write_to(self, terrain_file: io.FileIO) -> None:
 
-        # todo: save compressed data as well in some cases
-        if self.sector_pointers_type == self.SectorPointersType.no_pointers:
-            sector_pointers_type = self.SectorPointersType.no_pointers
-        else:
-            sector_pointers_type = self.SectorPointersType.simple_pointers
-
-        header_data = self.parser.pack(sector_pointers_type, self.sector_rows, self.sector_cols, self.original_type)
+        header_data = self.parser.pack(self.sector_pointers_type, self.sector_rows, self.sector_cols,
+                                       self.original_type)
 
         terrain_file.write(header_data)
 
 
+class SectorPointerFields(object):
+    """
+    Decodes the bit fields of sector pointer data, of a single pointer (an int) as well as of a numpy array of them
+    """
+
+    @staticmethod
+    def index(pointer_data: Union[int, numpy.ndarray]) -> Union[int, numpy.ndarray]:
+        return pointer_data & 0b11
+
+    @staticmethod
+    def mixed_terrain_index(pointer_data: Union[int, numpy.ndarray]) -> Union[int, numpy.ndarray]:
+        return (pointer_data >> 2) & 0b1111
+
+    @staticmethod
+    def to_terrain_index(pointer_data: Union[int, numpy.ndarray]) -> Union[int, numpy.ndarray]:
+        return (pointer_data >> 6) & 0b11111
+
+    @staticmethod
+    def from_terrain_index(pointer_data: Union[int, numpy.ndarray]) -> Union[int, numpy.ndarray]:
+        return (pointer_data >> 11) & 0b11111
+
+
 class SectorPointer(object):
 
     class MixedTerrainCoordinates(object):
@@ -140,36 +161,28 @@ class SectorPointer(object):
         MixedTerrainCoordinates(row=1, col=0, is_inverse_map=True),   # 14
     )
 
-    pointer_data_format = "H"
-
-    full_format = "<" + pointer_data_format
-
-    # For now only used for writing, parsing is done in bulks for efficiency reasons
-    # todo: remove me
-    parser = FileStruct(full_format)
-
     def __init__(self, pointer_data: int):
 
         self.pointer_data = pointer_data
 
     @property
     def index(self) -> int:
-        return self.pointer_data & 0b11
+        return SectorPointerFields.index(self.pointer_data)
 
     @property
     def mixed_terrain_index(self) -> int:
         """
         This index is translated to coordinates with the 'mixed_index_to_coordinates' tuple.
         """
-        return (self.pointer_data >> 2) & 0b1111
+        return SectorPointerFields.mixed_terrain_index(self.pointer_data)
 
     @property
     def to_terrain_index(self) -> int:
-        return (self.pointer_data >> 6) & 0b11111
+        return SectorPointerFields.to_terrain_index(self.pointer_data)
 
     @property
     def from_terrain_index(self) -> int:
-        return (self.pointer_data >> 11) & 0b11111
+        return SectorPointerFields.from_terrain_index(self.pointer_data)
 
     def to_terrain_name(self) -> str:
         return terrain_index_to_name[self.to_terrain_index]
@@ -177,12 +190,251 @@ class SectorPointer(object):
     def from_terrain_name(self) -> str:
         return terrain_index_to_name[self.from_terrain_index]
 
-    def write_to(self, terrain_file: io.FileIO) -> None:
-        # todo: remove and write in bulks
 
-        sector_pointer_data = self.parser.pack(self.pointer_data)
+class SectorPointers(object):
+    """
+    The pointers of many sectors at once (e.g. a region of a terrain), backed by a numpy array of the raw pointer data.
+    The properties are the same as those of a single SectorPointer, but they return whole arrays (of the same shape)
+    so that they can be used at array speed instead of creating a SectorPointer per sector.
+    """
+
+    terrain_names = numpy.array(terrain_index_to_name)
+
+    def __init__(self, pointer_data: numpy.ndarray):
+
+        self.pointer_data = pointer_data
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.pointer_data.shape
+
+    def __len__(self) -> int:
+        return len(self.pointer_data)
+
+    @property
+    def index(self) -> numpy.ndarray:
+        return SectorPointerFields.index(self.pointer_data)
+
+    @property
+    def mixed_terrain_index(self) -> numpy.ndarray:
+        """
+        See SectorPointer.mixed_terrain_index
+        """
+        return SectorPointerFields.mixed_terrain_index(self.pointer_data)
+
+    @property
+    def to_terrain_index(self) -> numpy.ndarray:
+        return SectorPointerFields.to_terrain_index(self.pointer_data)
+
+    @property
+    def from_terrain_index(self) -> numpy.ndarray:
+        return SectorPointerFields.from_terrain_index(self.pointer_data)
+
+    def to_terrain_name(self) -> numpy.ndarray:
+        return self.terrain_names[self.to_terrain_index]
+
+    def from_terrain_name(self) -> numpy.ndarray:
+        return self.terrain_names[self.from_terrain_index]
+
+
+class LazyCompressedSectorPointers(object):
+    """
+    The compressed pointers of a terrain, indexed by (row, col) like the inflated matrix but inflating only the columns
+    that are accessed. The offsets of the columns are scanned once, and inflated columns are held in a LRU cache of at
+    most 'cache_size' bytes.
+    The pointers are read only, inflate them (see 'inflate' or Terrain.load) to edit them.
+    """
+
+    def __init__(self, compressed_data: bytes, rows: int, cols: int, cache_size: int=1024 * 1024):
+
+        # As saved in the file, the compressed length of every column followed by its data
+        self.compressed_data = compressed_data
+
+        self.rows = rows
+        self.cols = cols
+
+        self.column_offsets = []  # type: List[Tuple[int, int]]
+
+        length_parser = Terrain.compressed_sector_pointers_length_parser
+        offset = 0
+
+        for _ in range(cols):
+
+            col_compressed_data_length, = length_parser.unpack_from(compressed_data, offset)
+            offset += length_parser.size
+
+            if offset + col_compressed_data_length > len(compressed_data):
+                raise Exception("Truncated compressed sector pointers!")
+
+            self.column_offsets.append((offset, col_compressed_data_length))
+            offset += col_compressed_data_length
+
+        # Column to its inflated data, least recently used first
+        self.cache_size = cache_size
+        self.cached_size = 0
+        self.col_to_data = OrderedDict()  # type: Dict[int, bytes]
+        self.cache_lock = threading.Lock()
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.rows, self.cols
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    @property
+    def dtype(self) -> numpy.dtype:
+        return numpy.dtype(Terrain.raw_sector_pointer_type)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def column(self, col: int) -> numpy.ndarray:
+
+        with self.cache_lock:
+
+            col_data = self.col_to_data.get(col)
+
+            if col_data is not None:
+                self.col_to_data.move_to_end(col)
+
+        if col_data is None:
+            col_data = self._inflate_column(col)
+            self._cache_column(col, col_data)
+
+        return numpy.frombuffer(buffer=col_data, dtype=Terrain.raw_sector_pointer_type)
+
+    def __getitem__(self, row_col: Tuple[Union[int, slice], Union[int, slice]]) -> Union[int, numpy.ndarray]:
+
+        if not isinstance(row_col, tuple):
+            row_col = (row_col, slice(None))
+
+        rows, cols = row_col
+
+        if not isinstance(cols, slice):
+            return self.column(range(self.cols)[cols])[rows]
+
+        cols = range(self.cols)[cols]
+
+        if not cols:
+            return numpy.empty((self.rows, 0), dtype=self.dtype)[rows]
+
+        return numpy.stack([self.column(col)[rows] for col in cols], axis=-1)
+
+    def __array__(self, dtype: numpy.dtype=None, copy: bool=None) -> numpy.ndarray:
+
+        raw_pointers = self.inflate()
+
+        return raw_pointers if dtype is None else raw_pointers.astype(dtype)
+
+    def inflate(self, jobs: int=None) -> numpy.ndarray:
+        """ Inflates all the columns (bypassing the cache) on a pool of 'jobs' threads, returns the whole matrix """
+
+        if not self.cols:
+            return numpy.empty((self.rows, 0), dtype=self.dtype)
+
+        # zlib releases the GIL, so threads are enough
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+
+            columns = [numpy.frombuffer(buffer=col_data, dtype=Terrain.raw_sector_pointer_type)
+                       for col_data in executor.map(self._inflate_column, range(self.cols))]
+
+        return numpy.stack(columns).transpose()
+
+    def _cache_column(self, col: int, col_data: bytes) -> None:
+
+        with self.cache_lock:
+
+            if col in self.col_to_data or len(col_data) > self.cache_size:
+                return
+
+            while self.cached_size + len(col_data) > self.cache_size:
+                _, evicted_data = self.col_to_data.popitem(last=False)
+                self.cached_size -= len(evicted_data)
+
+            self.col_to_data[col] = col_data
+            self.cached_size += len(col_data)
+
+    def _inflate_column(self, col: int) -> bytes:
+
+        offset, length = self.column_offsets[col]
+
+        return zlib.decompress(self.compressed_data[offset:offset + length])
+
+
+class TerrainStatistics(object):
+    """
+    Summed-area tables of the terrain types of sectors, so that the terrain types of any rectangular region are
+    counted in O(1) (after a single O(rows * cols) build).
+    Sectors of a single terrain (mixed terrain index 0) count as one sector of their from terrain, just like
+    SectorPointersResolver resolves them, and sectors of a transition count as half a sector of each of its terrains,
+    so the histogram of a region always sums to its area.
+    Only terrain types that are present get a table.
+    """
+
+    terrain_types = 1 << 5
+
+    def __init__(self, sector_pointers: SectorPointers):
+
+        from_terrain_indexes = sector_pointers.from_terrain_index
+        to_terrain_indexes = sector_pointers.to_terrain_index
+        is_single_terrain = sector_pointers.mixed_terrain_index == 0
+
+        rows, cols = sector_pointers.shape
+
+        self.present_types = numpy.union1d(from_terrain_indexes,
+                                           to_terrain_indexes[~is_single_terrain]).astype(numpy.intp)
+
+        # Counts are doubled (a transition adds 1 to each terrain) to stay integers, and halved when queried
+        dtype = numpy.int32 if 2 * rows * cols < 2 ** 31 else numpy.int64
+
+        self.tables = numpy.zeros((len(self.present_types), rows + 1, cols + 1), dtype=dtype)
+
+        for table, terrain_type in zip(self.tables, self.present_types):
+
+            is_from_terrain = from_terrain_indexes == terrain_type
+
+            counts = numpy.where(is_single_terrain, 2 * is_from_terrain,
+                                 is_from_terrain.astype(dtype) + (to_terrain_indexes == terrain_type)).astype(dtype)
+
+            numpy.cumsum(numpy.cumsum(counts, axis=0, dtype=dtype), axis=1, out=table[1:, 1:])
+
+    @property
+    def rows(self) -> int:
+        return self.tables.shape[1] - 1
+
+    @property
+    def cols(self) -> int:
+        return self.tables.shape[2] - 1
+
+    def histogram(self, rows: slice=slice(None), cols: slice=slice(None)) -> numpy.ndarray:
+        """ Returns the number of sectors of every terrain type (indexed like terrain_index_to_name) in the region """
+
+        start_row, stop_row, row_step = rows.indices(self.rows)
+        start_col, stop_col, col_step = cols.indices(self.cols)
 
-        terrain_file.write(sector_pointer_data)
+        if row_step != 1 or col_step != 1:
+            raise ValueError("Only contiguous regions are supported")
+
+        stop_row = max(start_row, stop_row)
+        stop_col = max(start_col, stop_col)
+
+        doubled_counts = (self.tables[:, stop_row, stop_col] - self.tables[:, start_row, stop_col] -
+                          self.tables[:, stop_row, start_col] + self.tables[:, start_row, start_col])
+
+        histogram = numpy.zeros(self.terrain_types)
+        histogram[self.present_types] = doubled_counts / 2
+
+        return histogram
+
+    def fractions(self, rows: slice=slice(None), cols: slice=slice(None)) -> numpy.ndarray:
+        """ Just like 'histogram', but the fraction of the region of every terrain type """
+
+        histogram = self.histogram(rows=rows, cols=cols)
+        area = histogram.sum()
+
+        return histogram / area if area else histogram
 
 
 class Terrain(object):
@@ -198,6 +450,8 @@ class Terrain(object):
 
         self.raw_sector_pointers = raw_sector_pointers
 
+        self._statistics = None  # type: Optional[TerrainStatistics]
+
     @property
     def cols(self) -> int:
         return self.header.sector_cols
@@ -214,15 +468,68 @@ class Terrain(object):
     def has_compressed_sector_pointers(self) -> bool:
         return self.header.sector_pointers_type == TerrainHeader.SectorPointersType.compressed_pointers
 
-    def __getitem__(self, row_col: Tuple[int, int]) -> SectorPointer:
-        """ Returns a pointer of the requested sector """
+    @property
+    def statistics(self) -> TerrainStatistics:
+        """
+        The terrain type statistics of the sectors, only built on first use.
+        They are rebuilt after the terrain is written, so write the terrain after editing the pointers.
+        """
+
+        if self._statistics is None:
+            self._statistics = TerrainStatistics(self.sector_pointers)
+
+        return self._statistics
+
+    def load(self, jobs: int=None) -> None:
+        """ Reads lazily read pointers (see 'read') into memory, compressed ones are inflated on 'jobs' threads """
+
+        if isinstance(self.raw_sector_pointers, LazyCompressedSectorPointers):
+            self.raw_sector_pointers = self.raw_sector_pointers.inflate(jobs=jobs)
+
+        elif isinstance(self.raw_sector_pointers, numpy.memmap):
+            self.raw_sector_pointers = numpy.array(self.raw_sector_pointers)
+
+    def is_mapped_from(self, file_path: str) -> bool:
+        """ Whether the pointers are lazily mapped from the file (see 'read') """
+
+        return (isinstance(self.raw_sector_pointers, numpy.memmap) and self.raw_sector_pointers.filename is not None
+                and os.path.exists(file_path) and os.path.samefile(self.raw_sector_pointers.filename, file_path))
+
+    def __getitem__(self, row_col: Tuple[Union[int, slice], Union[int, slice]]) -> Union[SectorPointer, SectorPointers]:
+        """
+        Returns a pointer of the requested sector, or when given slices (e.g. terrain[10:20, 5:15]) the pointers of
+        the requested region.
+        """
+
+        raw_sector_pointers = self.raw_sector_pointers[row_col]
+
+        if isinstance(raw_sector_pointers, numpy.ndarray) and raw_sector_pointers.ndim:
+            return SectorPointers(raw_sector_pointers)
+
+        return SectorPointer(raw_sector_pointers)
+
+    @property
+    def sector_pointers(self) -> SectorPointers:
+        """
+        The pointers of all the sectors, indexed by (row, col).
+        Lazy compressed terrains are inflated whole on every access (use slices of the terrain for regions), call
+        'load' first to inflate them only once.
+        """
 
-        raw_sector_pointer = self.raw_sector_pointers[row_col]
+        if not self.has_sector_pointers:
+            raise ValueError("The terrain '%s' has no sector pointers" % self.file_path)
 
-        return SectorPointer(raw_sector_pointer)
+        return SectorPointers(numpy.asarray(self.raw_sector_pointers))
 
     @classmethod
-    def read(cls, terrain_file_path: str) -> "Terrain":
+    def read(cls, terrain_file_path: str, lazy: bool=False, cache_size: int=1024 * 1024) -> "Terrain":
+        """
+        When 'lazy', simple pointers are memory mapped instead of read, so that huge terrains open instantly and
+        processes that open the same terrain share the page cache. The mapping is copy-on-write, edits are never
+        saved to the file (unless written with 'write').
+        Lazy compressed pointers are only inflated column by column as they are accessed, holding at most
+        'cache_size' bytes of inflated columns (see LazyCompressedSectorPointers).
+        """
 
         with open(terrain_file_path, "rb") as terrain_file:
 
@@ -234,6 +541,15 @@ class Terrain(object):
 
             if header.sector_pointers_type == TerrainHeader.SectorPointersType.simple_pointers:
 
+                # An empty file can not be mapped
+                if lazy and header.sector_cols and header.sector_rows:
+
+                    raw_pointers = numpy.memmap(terrain_file_path, dtype=cls.raw_sector_pointer_type, mode="c",
+                                                offset=TerrainHeader.parser.size,
+                                                shape=(header.sector_cols, header.sector_rows)).transpose()
+
+                    return Terrain(file_path=terrain_file_path, header=header, raw_sector_pointers=raw_pointers)
+
                 raw_pointers = numpy.fromfile(file=terrain_file, dtype=cls.raw_sector_pointer_type)  # type: NumpyMatrix
 
                 shape = (header.sector_cols, header.sector_rows)
@@ -243,10 +559,18 @@ class Terrain(object):
 
             elif header.sector_pointers_type == TerrainHeader.SectorPointersType.compressed_pointers:
 
+                if lazy:
+
+                    raw_pointers = LazyCompressedSectorPointers(compressed_data=terrain_file.read(),
+                                                                rows=header.sector_rows, cols=header.sector_cols,
+                                                                cache_size=cache_size)
+
+                    return Terrain(file_path=terrain_file_path, header=header, raw_sector_pointers=raw_pointers)
+
                 columns_iterator = cls._yield_uncompressed_sector_pointers_columns(
                     terrain_file=terrain_file, header=header)
 
-                raw_pointers = numpy.stack(columns_iterator).transpose()  # type: NumpyMatrix
+                raw_pointers = numpy.stack(list(columns_iterator)).transpose()  # type: NumpyMatrix
 
                 return Terrain(file_path=terrain_file_path, header=header, raw_sector_pointers=raw_pointers)
 
@@ -254,7 +578,14 @@ class Terrain(object):
 
                 raise Exception("Bad pointers type header!")
 
-    def write(self, terrain_file_path: str) -> None:
+    def write(self, terrain_file_path: str, jobs: int=None) -> None:
+        """ Compressed terrains are saved compressed, with the columns compressed on a pool of 'jobs' threads """
+
+        self._statistics = None
+
+        # Truncating the mapped file would pull the pointers from under the mapping
+        if self.is_mapped_from(terrain_file_path):
+            self.load()
 
         with open(terrain_file_path, "wb") as terrain_file:
 
@@ -263,14 +594,40 @@ class Terrain(object):
             if not self.has_sector_pointers:
                 return
 
-            for col in range(self.cols):
-                for row in range(self.rows):
-                    self[row, col].write_to(terrain_file)
+            # Lazy compressed pointers can not be edited, so they are saved as they were read
+            if self.has_compressed_sector_pointers and isinstance(self.raw_sector_pointers,
+                                                                  LazyCompressedSectorPointers):
+                terrain_file.write(self.raw_sector_pointers.compressed_data)
+                return
+
+            # The pointers are saved column after column, so the columns are made the contiguous rows here
+            columns = numpy.ascontiguousarray(numpy.asarray(self.raw_sector_pointers).transpose(),
+                                              dtype=numpy.dtype(self.raw_sector_pointer_type).newbyteorder("<"))
+
+            if self.has_compressed_sector_pointers:
+                self._write_compressed_sector_pointers_columns(terrain_file=terrain_file, columns=columns, jobs=jobs)
+            else:
+                terrain_file.write(columns.tobytes())
+
+    @classmethod
+    def _write_compressed_sector_pointers_columns(cls,
+                                                  terrain_file: io.FileIO,
+                                                  columns: numpy.ndarray,
+                                                  jobs: int=None) -> None:
+
+        # zlib releases the GIL, so threads are enough
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+
+            for col_compressed_data in executor.map(zlib.compress, columns):
+
+                cls.compressed_sector_pointers_length_parser.pack_into_file(terrain_file, len(col_compressed_data))
+
+                terrain_file.write(col_compressed_data)
 
     @classmethod
     def _yield_uncompressed_sector_pointers_columns(cls,
                                                     terrain_file: io.FileIO,
-                                                    header: TerrainHeader) -> Iterator(numpy.ndarray):
+                                                    header: TerrainHeader) -> Iterator[numpy.ndarray]:
 
         for _ in range(header.sector_cols):
 
@@ -281,3 +638,155 @@ class Terrain(object):
             col_data = zlib.decompress(col_compressed_data)
 
             yield numpy.frombuffer(buffer=col_data, dtype=cls.raw_sector_pointer_type)
+
+
+class ResolvedSectors(object):
+    """
+    The base terrain sectors that sector pointers point to, as arrays of the shape of the pointers:
+    The index of the terrain folder in 'folders', the row and col of the sector in the folder and the variant index.
+    Invalid pointers (out of range terrain or mixed terrain indexes) have a folder index, row and col of -1.
+    """
+
+    invalid_index = -1
+
+    def __init__(self, folders: Tuple[str, ...], folder_indexes: numpy.ndarray, rows: numpy.ndarray,
+                 cols: numpy.ndarray, variants: numpy.ndarray):
+
+        self.folders = folders
+
+        self.folder_indexes = folder_indexes
+        self.rows = rows
+        self.cols = cols
+        self.variants = variants
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.folder_indexes.shape
+
+    @property
+    def is_valid(self) -> numpy.ndarray:
+        return self.folder_indexes != self.invalid_index
+
+    @property
+    def folder_names(self) -> numpy.ndarray:
+        """ The names of the folders, empty for invalid pointers (their index of -1 picks the appended name) """
+
+        return numpy.array(self.folders + ("",))[self.folder_indexes]
+
+
+class SectorPointersResolver(object):
+    """
+    Resolves sector pointers to the base terrain sectors they point to (see ResolvedSectors).
+    Pointers of a single terrain are in the folder of their from terrain, and pointers of mixed terrains are in the
+    folder of the transition (e.g. "green grasslands to water", or "water to green grasslands" for inverse maps).
+    Real terrains only use a few hundred distinct pointers, so every distinct pointer is resolved once and remembered,
+    and whole terrains are resolved by indexing a table of the distinct pointers.
+    """
+
+    def __init__(self):
+
+        self.folders = []  # type: List[str]
+        self.folder_to_index = {}  # type: Dict[str, int]
+
+        # Pointer data to (folder index, row, col, variant)
+        self.pointer_data_to_sector = {}  # type: Dict[int, Tuple[int, int, int, int]]
+
+        self.lock = threading.Lock()
+
+    def resolve_pointer(self, sector_pointer: SectorPointer) -> Tuple[str, int, int, int]:
+        """ Returns the terrain folder, row, col and variant of a single pointer, raises ValueError if it is invalid """
+
+        folder_index, row, col, variant = self._resolve_pointer_data(int(sector_pointer.pointer_data))
+
+        if folder_index == ResolvedSectors.invalid_index:
+            raise ValueError("Invalid sector pointer 0x%04X" % sector_pointer.pointer_data)
+
+        return self.folders[folder_index], row, col, variant
+
+    def resolve(self, raw_sector_pointers: NumpyMatrix) -> ResolvedSectors:
+        """ Invalid pointers do not fail the whole resolution, they are marked as invalid (see ResolvedSectors) """
+
+        raw_sector_pointers = numpy.asarray(raw_sector_pointers)
+
+        distinct_pointers, inverse = numpy.unique(raw_sector_pointers, return_inverse=True)
+
+        table = numpy.array([self._resolve_pointer_data(int(pointer_data)) for pointer_data in distinct_pointers],
+                            dtype=numpy.int32).reshape(-1, 4)
+
+        sectors = table[inverse.reshape(-1)].reshape(raw_sector_pointers.shape + (4,))
+
+        with self.lock:
+            folders = tuple(self.folders)
+
+        return ResolvedSectors(folders=folders, folder_indexes=sectors[..., 0], rows=sectors[..., 1],
+                               cols=sectors[..., 2], variants=sectors[..., 3])
+
+    def resolve_terrain(self, terrain: Terrain,
+                        row_col: Tuple[Union[int, slice], Union[int, slice]]=(slice(None), slice(None))
+                        ) -> ResolvedSectors:
+        """ Resolves the whole terrain, or only the requested region (see Terrain.__getitem__) """
+
+        return self.resolve(terrain[row_col].pointer_data)
+
+    @staticmethod
+    def is_valid(sector_pointer: SectorPointer) -> bool:
+        """ The bit fields can hold more terrains and mixed terrain indexes than there are """
+
+        mixed_terrain_index = sector_pointer.mixed_terrain_index
+
+        if mixed_terrain_index >= len(SectorPointer.mixed_index_to_coordinates):
+            return False
+
+        if sector_pointer.from_terrain_index >= len(terrain_index_to_name):
+            return False
+
+        # The to terrain is only used by transitions
+        return not mixed_terrain_index or sector_pointer.to_terrain_index < len(terrain_index_to_name)
+
+    def _resolve_pointer_data(self, pointer_data: int) -> Tuple[int, int, int, int]:
+
+        sector = self.pointer_data_to_sector.get(pointer_data)
+
+        if sector is not None:
+            return sector
+
+        sector_pointer = SectorPointer(pointer_data)
+
+        if not self.is_valid(sector_pointer):
+
+            sector = (ResolvedSectors.invalid_index, ResolvedSectors.invalid_index, ResolvedSectors.invalid_index,
+                      sector_pointer.index)
+
+            with self.lock:
+                self.pointer_data_to_sector[pointer_data] = sector
+
+            return sector
+
+        coordinates = SectorPointer.mixed_index_to_coordinates[sector_pointer.mixed_terrain_index]
+
+        if coordinates is None:
+
+            folder = sector_pointer.from_terrain_name()
+            row, col = 0, 0
+
+        else:
+
+            terrain_names = (sector_pointer.from_terrain_name(), sector_pointer.to_terrain_name())
+
+            if coordinates.is_inverse_map:
+                terrain_names = terrain_names[::-1]
+
+            folder = "%s to %s" % terrain_names
+            row, col = coordinates.row, coordinates.col
+
+        with self.lock:
+
+            folder_index = self.folder_to_index.get(folder)
+
+            if folder_index is None:
+                folder_index = self.folder_to_index[folder] = len(self.folders)
+                self.folders.append(folder)
+
+            sector = self.pointer_data_to_sector[pointer_data] = (folder_index, row, col, sector_pointer.index)
+
+        return sector
@@ -0,0 +1,167 @@
+from formats.dat import Dat, DatDirectory, DatEntry, LazyDatDirectory
+
+from os import path
+import io
+import os
+import re
+from fnmatch import fnmatch
+from glob import glob
+
+from typing import Dict, Iterable, List, Tuple, Union
+
+
+class DatLayout(object):
+    """ Where the dat files of the game are, relative to the arcanum directory """
+
+    modules_folder = "modules"
+
+    main_dat_names_template = "arcanum*.dat"
+    module_dat_names_template = "*.dat"
+    module_patch_dat_names_template = "*.patch*"
+
+    digits_pattern = re.compile(r"(\d+)")
+
+    @classmethod
+    def get_dat_sort_key(cls, dat_file_path: str) -> List[Union[str, int]]:
+        """ Numbers in the file name are compared by value, so that e.g. 'X.patch2' comes before 'X.patch10' """
+
+        return [int(part) if part.isdigit() else part.lower()
+                for part in cls.digits_pattern.split(path.basename(dat_file_path))]
+
+    @classmethod
+    def sort_dat_paths(cls, dat_file_paths: Iterable[str]) -> List[str]:
+        """ Sorts dats (e.g. 'arcanum2.dat' or '*.patch1') after the ones they override """
+
+        return sorted(dat_file_paths, key=cls.get_dat_sort_key)
+
+
+class ResourceFS(object):
+    """
+    A read only file system over several dat files at once, nothing is extracted to disk.
+    The dats are layered in the given order, so files of later dats override the files of former ones.
+    Every module is a namespace of its own, so a game is mounted with 'mount_module', which layers the main dats
+    (arcanum*.dat) and then only the dat and the patches of that module (modules/<module>.dat, modules/<module>.patch*).
+    Paths are case insensitive and can use either slash as a separator.
+    """
+
+    def __init__(self, dats: List[Dat], path_to_source: Dict[str, Tuple[Dat, str]]):
+
+        self.dats = dats
+
+        # Normalized path to the dat that holds it and the name of the entry in that dat
+        self.path_to_source = path_to_source
+
+        self._tree = LazyDatDirectory(self._build_tree)
+
+    @classmethod
+    def get_module_dat_paths(cls, arcanum_directory: str, module_name: str) -> List[str]:
+        """ Returns the paths of the dats of the module in the order they are layered in (see the class) """
+
+        modules_directory = path.join(arcanum_directory, DatLayout.modules_folder)
+        module_file_names = os.listdir(modules_directory) if path.isdir(modules_directory) else []
+
+        # The module names replace the wildcard of the templates of all the modules, e.g. 'arcanum.patch*'
+        module_name = module_name.lower()
+        module_dat_pattern = DatLayout.module_dat_names_template.replace("*", module_name, 1)
+        module_patch_pattern = DatLayout.module_patch_dat_names_template.replace("*", module_name, 1)
+
+        module_dat_file_names = DatLayout.sort_dat_paths(file_name for file_name in module_file_names
+                                                         if fnmatch(file_name.lower(), module_dat_pattern))
+        module_patch_file_names = DatLayout.sort_dat_paths(file_name for file_name in module_file_names
+                                                           if fnmatch(file_name.lower(), module_patch_pattern))
+
+        return (DatLayout.sort_dat_paths(glob(path.join(arcanum_directory, DatLayout.main_dat_names_template))) +
+                [path.join(modules_directory, file_name)
+                 for file_name in module_dat_file_names + module_patch_file_names])
+
+    @classmethod
+    def mount_module(cls, arcanum_directory: str, module_name: str="Arcanum", **dat_open_arguments) -> "ResourceFS":
+        """ Mounts the dats of a single module of the game in the arcanum directory (see the class) """
+
+        return cls.mount(cls.get_module_dat_paths(arcanum_directory, module_name), **dat_open_arguments)
+
+    @classmethod
+    def mount(cls, dat_file_paths: List[str], **dat_open_arguments) -> "ResourceFS":
+        """
+        Opens all the dats (with the given Dat.open arguments) and merges their indexes, in the given order.
+        The dats should all belong to the same module (see 'get_module_dat_paths').
+        """
+
+        dats = [Dat.open(dat_file_path, **dat_open_arguments) for dat_file_path in dat_file_paths]
+
+        path_to_source = {}  # type: Dict[str, Tuple[Dat, str]]
+
+        for dat in dats:
+            for name in dat.keys():
+                path_to_source[cls.normalize_path(name)] = (dat, name)
+
+        return ResourceFS(dats=dats, path_to_source=path_to_source)
+
+    @staticmethod
+    def normalize_path(resource_path: str) -> str:
+        return resource_path.replace("/", "\\").strip("\\").lower()
+
+    def close(self) -> None:
+
+        for dat in self.dats:
+            dat.close()
+
+    def __enter__(self) -> "ResourceFS":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __contains__(self, resource_path: str) -> bool:
+        return self.exists(resource_path)
+
+    def __len__(self) -> int:
+        return len(self.path_to_source)
+
+    def exists(self, resource_path: str) -> bool:
+        return self.normalize_path(resource_path) in self.path_to_source
+
+    def resolve(self, resource_path: str) -> Tuple[Dat, str]:
+        """ Returns the dat that provides the path and the name of its entry, raises KeyError if there is none """
+
+        return self.path_to_source[self.normalize_path(resource_path)]
+
+    def read(self, resource_path: str) -> Union[bytes, memoryview]:
+
+        dat, name = self.resolve(resource_path)
+
+        return dat[name]
+
+    def open(self, resource_path: str) -> io.BufferedReader:
+
+        dat, name = self.resolve(resource_path)
+
+        return dat.open_entry(name)
+
+    @property
+    def tree(self) -> DatDirectory:
+        """ The merged directory tree of the normalized paths, only built on first use """
+
+        return self._tree.get()
+
+    def _build_tree(self) -> DatDirectory:
+
+        tree = DatDirectory(name="")
+
+        for resource_path, (dat, name) in self.path_to_source.items():
+            index = dat.name_to_entry
+            flags = index.flags[index.name_to_index[name]]
+            tree.add(resource_path, is_directory=bool(flags & DatEntry.Flags.is_directory))
+
+        return tree
+
+    def glob(self, pattern: str) -> List[str]:
+        """
+        Returns the (original) names of all the files and directories matching the pattern, only matching directories
+        of the merged tree are visited (see DatDirectory.glob): wildcards never match a separator, except for a '**'
+        component which matches any number of directories.
+        """
+
+        # Parent directories without entries of their own are only in the tree
+        return [self.path_to_source[resource_path][1] for resource_path in self.tree.match(self.normalize_path(pattern))
+                if resource_path in self.path_to_source]
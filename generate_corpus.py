@@ -0,0 +1,248 @@
+import argparse
+
+from os import path
+import os
+import random
+import shutil
+
+from typing import List
+
+import numpy
+
+from formats.dat import DatWriter
+from formats.map.prp import MapProperties
+from formats.map.sbf import BlockedSectors
+from formats.map.sec import Sector, SectorLights, SectorTiles, SectorRoofs, SectorTileScripts, SectorInfo, \
+    SectorObjects
+from formats.map.tdf import Terrain, TerrainHeader, terrain_index_to_name
+
+
+"""
+Generates a deterministic (by seed) corpus of valid files in the formats of Arcanum, so that the parsers can be
+tested and benchmarked without a copy of the game.
+
+Output layout:
+- terrain/<terrain name>/terrain.tdf, one terrain for every SectorPointersType
+- maps/<map name>/map.prp, terrain.tdf (the world terrain), blocked.sbf and sectors of every SectorInfo.Type
+- arcanum<n>.dat, holding all of the above and filler members that are both compressible and not (so both
+  compressed and stored entries)
+"""
+
+
+class Constants(object):
+
+    terrain_folder = "terrain"
+    maps_folder = "maps"
+
+    terrain_file_name = "terrain.tdf"
+    map_properties_file_name = "map.prp"
+    blocked_sectors_file_name = "blocked.sbf"
+    sector_extension = ".sec"
+
+    dat_names_template = "arcanum%d.dat"
+    filler_folder = "art"
+
+    map_name = "synthetic"
+
+    # Real maps only reuse a few hundred distinct sector pointers
+    distinct_sector_pointers = 300
+
+    sector_info_types = (
+        SectorInfo.Type.NO_INFO,
+        SectorInfo.Type.TILE_SCRIPTS,
+        SectorInfo.Type.ALL_SCRIPTS,
+        SectorInfo.Type.BASIC,
+        SectorInfo.Type.FULL,
+    )
+
+
+def generate_sector_pointers(rng: numpy.random.Generator, rows: int, cols: int) -> numpy.ndarray:
+    """ Returns a (rows, cols) matrix of raw sector pointers made of patches of the same pointers, like real worlds """
+
+    indexes = rng.integers(0, 4, Constants.distinct_sector_pointers)
+    mixed_terrain_indexes = rng.integers(0, 15, Constants.distinct_sector_pointers)
+    to_terrain_indexes = rng.integers(0, len(terrain_index_to_name), Constants.distinct_sector_pointers)
+    from_terrain_indexes = rng.integers(0, len(terrain_index_to_name), Constants.distinct_sector_pointers)
+
+    palette = (indexes | (mixed_terrain_indexes << 2) | (to_terrain_indexes << 6) |
+               (from_terrain_indexes << 11)).astype(Terrain.raw_sector_pointer_type)
+
+    patch_size = 4
+    patches = rng.integers(0, len(palette), ((rows + patch_size - 1) // patch_size,
+                                             (cols + patch_size - 1) // patch_size))
+
+    patches = numpy.repeat(numpy.repeat(patches, patch_size, axis=0), patch_size, axis=1)[:rows, :cols]
+
+    return palette[patches]
+
+
+def generate_terrain(terrain_file_path: str, rng: numpy.random.Generator, sector_pointers_type: int,
+                     rows: int, cols: int, original_type: int) -> None:
+
+    header = TerrainHeader(sector_pointers_type=sector_pointers_type, sector_rows=rows, sector_cols=cols,
+                           original_type=original_type)
+
+    if sector_pointers_type == TerrainHeader.SectorPointersType.no_pointers:
+        Terrain(file_path=terrain_file_path, header=header, raw_sector_pointers=None).write(terrain_file_path)
+        return
+
+    raw_sector_pointers = generate_sector_pointers(rng, rows=rows, cols=cols)
+
+    terrain = Terrain(file_path=terrain_file_path, header=header, raw_sector_pointers=raw_sector_pointers)
+    terrain.write(terrain_file_path)
+
+
+def generate_sector(sector_file_path: str, rng: random.Random, info_type: int) -> None:
+
+    lights = SectorLights(raw_lights=[rng.randbytes(48) for _ in range(rng.randrange(4))])
+
+    tiles = SectorTiles(raw_tiles=[rng.getrandbits(32) for _ in range(4096)])
+
+    if rng.random() < 0.5:
+        roofs = SectorRoofs(type=0, raw_roofs=[rng.getrandbits(32) for _ in range(256)])
+    else:
+        roofs = SectorRoofs(type=1, raw_roofs=[])
+
+    tile_scripts = SectorTileScripts(raw_scripts=[rng.randbytes(24) for _ in range(rng.randrange(4))])
+
+    info = SectorInfo(type=info_type, tile_scripts=tile_scripts,
+                      sector_script=(rng.getrandbits(32), rng.getrandbits(32), rng.getrandbits(32)),
+                      town_map=rng.randrange(100), magick_aptitude=rng.randrange(-100, 100),
+                      light_scheme=rng.randrange(10), music=rng.randrange(100), ambient=rng.randrange(100),
+                      blockades=[rng.getrandbits(8) for _ in range(512)])
+
+    # Objects can not be parsed yet, so sectors are generated without any
+    objects = SectorObjects(objects=[])
+
+    sector = Sector(file_path=sector_file_path, lights=lights, tiles=tiles, roofs=roofs, info=info, objects=objects)
+    sector.write(sector_file_path)
+
+
+def generate_map(map_directory: str, rng: random.Random, numpy_rng: numpy.random.Generator,
+                 world_rows: int, world_cols: int, sectors: int) -> None:
+
+    os.makedirs(map_directory, exist_ok=True)
+
+    original_type = rng.randrange(len(terrain_index_to_name))
+
+    map_properties = MapProperties(file_path=path.join(map_directory, Constants.map_properties_file_name),
+                                   original_type=original_type, stamp=rng.getrandbits(32),
+                                   tile_rows=world_rows * 64, tile_cols=world_cols * 64)
+    map_properties.write(map_properties.file_path)
+
+    generate_terrain(path.join(map_directory, Constants.terrain_file_name), numpy_rng,
+                     sector_pointers_type=TerrainHeader.SectorPointersType.compressed_pointers,
+                     rows=world_rows, cols=world_cols, original_type=original_type)
+
+    blocked_sectors = sorted({(rng.randrange(min(world_cols, 0xFFF)), rng.randrange(world_rows))
+                              for _ in range(max(1, sectors // 4))})
+    BlockedSectors(file_path="", blocked_sectors=blocked_sectors).write(
+        path.join(map_directory, Constants.blocked_sectors_file_name))
+
+    for sector_index in range(sectors):
+
+        sector_row, sector_col = divmod(sector_index, world_cols)
+        sector_id = sector_col | (sector_row << 26)
+
+        info_type = Constants.sector_info_types[sector_index % len(Constants.sector_info_types)]
+
+        generate_sector(path.join(map_directory, "%d%s" % (sector_id, Constants.sector_extension)), rng, info_type)
+
+
+def generate_terrains(terrain_directory: str, numpy_rng: numpy.random.Generator, rows: int, cols: int) -> None:
+
+    sector_pointers_types = (
+        TerrainHeader.SectorPointersType.no_pointers,
+        TerrainHeader.SectorPointersType.simple_pointers,
+        TerrainHeader.SectorPointersType.compressed_pointers,
+    )
+
+    for terrain_index, sector_pointers_type in enumerate(sector_pointers_types):
+
+        terrain_folder = path.join(terrain_directory, terrain_index_to_name[terrain_index])
+        os.makedirs(terrain_folder, exist_ok=True)
+
+        generate_terrain(path.join(terrain_folder, Constants.terrain_file_name), numpy_rng,
+                         sector_pointers_type=sector_pointers_type, rows=rows, cols=cols,
+                         original_type=terrain_index)
+
+
+def generate_fillers(filler_directory: str, rng: random.Random, entries: int, max_entry_size: int) -> None:
+    """ Half of the fillers are random (so they are stored) and half are repetitive (so they are compressed) """
+
+    os.makedirs(filler_directory, exist_ok=True)
+
+    for entry_index in range(entries):
+
+        size = rng.randrange(max_entry_size + 1)
+
+        if entry_index % 2:
+            data = rng.randbytes(size)
+        else:
+            data = (rng.randbytes(16) * (size // 16 + 1))[:size]
+
+        with open(path.join(filler_directory, "filler%06d.art" % entry_index), "wb") as filler_file:
+            filler_file.write(data)
+
+
+def generate_corpus(output_directory: str, seed: int=0, world_rows: int=64, world_cols: int=64,
+                    map_sectors: int=16, terrain_size: int=4, dat_files: int=1, dat_entries: int=1000,
+                    max_dat_entry_size: int=16 * 1024) -> List[str]:
+    """ Generates the corpus (see the module documentation) and returns the paths of the generated dat files """
+
+    rng = random.Random(seed)
+    numpy_rng = numpy.random.default_rng(seed)
+
+    terrain_directory = path.join(output_directory, Constants.terrain_folder)
+    map_directory = path.join(output_directory, Constants.maps_folder, Constants.map_name)
+
+    generate_terrains(terrain_directory, numpy_rng, rows=terrain_size, cols=terrain_size)
+
+    generate_map(map_directory, rng, numpy_rng, world_rows=world_rows, world_cols=world_cols, sectors=map_sectors)
+
+    dat_file_paths = []
+
+    for dat_index in range(1, dat_files + 1):
+
+        dat_content_directory = path.join(output_directory, "dat%d" % dat_index)
+
+        generate_fillers(path.join(dat_content_directory, Constants.filler_folder), rng,
+                         entries=dat_entries, max_entry_size=max_dat_entry_size)
+
+        # The first dat holds the maps and terrains as well
+        if dat_index == 1:
+            for folder in (Constants.terrain_folder, Constants.maps_folder):
+                shutil.copytree(path.join(output_directory, folder), path.join(dat_content_directory, folder))
+
+        dat_file_path = path.join(output_directory, Constants.dat_names_template % dat_index)
+
+        DatWriter(jobs=1, guid=rng.randbytes(16)).write_directory(dat_file_path, dat_content_directory)
+        shutil.rmtree(dat_content_directory)
+
+        dat_file_paths.append(dat_file_path)
+
+    return dat_file_paths
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Generates a synthetic corpus of Arcanum files for testing and '
+                                                 'benchmarking.')
+    parser.add_argument('output_directory', help='The directory to generate the corpus in')
+    parser.add_argument('--seed', help='The same seed always generates the same corpus', type=int, default=0)
+    parser.add_argument('--world-size', help='The number of sector rows and cols of the world terrain',
+                        type=int, default=64)
+    parser.add_argument('--map-sectors', help='The number of sector files of the map', type=int, default=16)
+    parser.add_argument('--terrain-size', help='The number of sector rows and cols of the base terrains',
+                        type=int, default=4)
+    parser.add_argument('--dat-files', help='The number of dat files', type=int, default=1)
+    parser.add_argument('--dat-entries', help='The number of filler entries in every dat', type=int, default=1000)
+    parser.add_argument('--dat-entry-size', help='The maximal size of filler entries', type=int, default=16 * 1024)
+
+    arguments = parser.parse_args()
+
+    generate_corpus(output_directory=arguments.output_directory, seed=arguments.seed,
+                    world_rows=arguments.world_size, world_cols=arguments.world_size,
+                    map_sectors=arguments.map_sectors, terrain_size=arguments.terrain_size,
+                    dat_files=arguments.dat_files, dat_entries=arguments.dat_entries,
+                    max_dat_entry_size=arguments.dat_entry_size)
@@ -0,0 +1,52 @@
+import argparse
+
+from os import path
+
+from formats.dat import Dat, DatWriter
+
+
+def main(input_path: str, dat_file_path: str, jobs: int, use_processes: bool, compression_level: int,
+         patch_base_path: str) -> None:
+
+    writer = DatWriter(jobs=jobs, use_processes=use_processes, compression_level=compression_level)
+
+    if not patch_base_path:
+
+        print("Packing '%s' into '%s'..." % (input_path, dat_file_path))
+
+        writer.write_directory(dat_file_path=dat_file_path, directory=input_path)
+
+        return
+
+    print("Packing changes of '%s' from '%s' into '%s'..." % (input_path, patch_base_path, dat_file_path))
+
+    with Dat.open(patch_base_path) as base_dat:
+
+        if path.isdir(input_path):
+            writer.write_patch(dat_file_path=dat_file_path, base_dat=base_dat, source=input_path)
+        else:
+            with Dat.open(input_path) as source_dat:
+                writer.write_patch(dat_file_path=dat_file_path, base_dat=base_dat, source=source_dat)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Creates an Arcanum dat file from a directory.')
+    parser.add_argument('input_path', help='The directory to pack, paths in the dat are relative to it. '
+                                           'When creating a patch it can also be a newer dat file')
+    parser.add_argument('dat_file_path', help='The path of the dat file to create')
+    parser.add_argument('--jobs', '-j', help='Number of compression workers (defaults to the number of CPUs)',
+                        type=int, default=None)
+    parser.add_argument('--processes', help='Compress on worker processes instead of threads',
+                        action='store_true', default=False)
+    parser.add_argument('--compression-level', help='The zlib compression level (0-9)',
+                        type=int, default=-1)
+    parser.add_argument('--patch-base', help='A dat file to create a patch for, only files that were added or '
+                                             'changed compared to it are packed (e.g. into "modules/X.patch0")',
+                        default='')
+
+    arguments = parser.parse_args()
+
+    main(input_path=arguments.input_path, dat_file_path=arguments.dat_file_path, jobs=arguments.jobs,
+         use_processes=arguments.processes, compression_level=arguments.compression_level,
+         patch_base_path=arguments.patch_base)
@@ -0,0 +1,110 @@
+from formats.dat import Dat, DatWriter
+
+from os import path
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+from typing import Dict, Union
+
+
+class DatThreadsTest(unittest.TestCase):
+    """ A single Dat is shared by many threads, every read must be exactly what a single thread reads """
+
+    threads = 8
+    rounds = 4
+
+    @classmethod
+    def setUpClass(cls) -> None:
+
+        cls.directory = tempfile.mkdtemp()
+        cls.dat_file_path = path.join(cls.directory, "test.dat")
+
+        rng = random.Random(0)
+        files = []
+
+        for file_index in range(300):
+
+            size = rng.randrange(64 * 1024)
+
+            # Half random (stored) and half repetitive (compressed)
+            if file_index % 2:
+                data = rng.randbytes(size)
+            else:
+                data = (rng.randbytes(16) * (size // 16 + 1))[:size]
+
+            files.append(("folder%d\\file%04d.art" % (file_index % 5, file_index), data))
+
+        DatWriter(jobs=2).write(cls.dat_file_path, files)
+
+        with Dat.open(cls.dat_file_path) as dat:
+            cls.reference = {name: bytes(dat[name]) for name in dat.keys()}  # type: Dict[str, bytes]
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def run_threads(self, dat: Dat) -> None:
+
+        names = list(self.reference)
+        errors = []
+        barrier = threading.Barrier(self.threads)
+
+        def check(name: str, data: Union[bytes, memoryview]) -> None:
+            if bytes(data) != self.reference[name]:
+                errors.append(name)
+
+        def run(thread_index: int) -> None:
+
+            thread_names = list(names)
+            random.Random(thread_index).shuffle(thread_names)
+
+            barrier.wait()
+
+            try:
+                for _ in range(self.rounds):
+
+                    for name in thread_names:
+                        check(name, dat[name])
+
+                    for name, data in dat.read_many(thread_names, ordered=bool(thread_index % 2), jobs=2):
+                        check(name, data)
+
+            except Exception as exception:
+                errors.append(repr(exception))
+
+        threads = [threading.Thread(target=run, args=(thread_index,)) for thread_index in range(self.threads)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+    def test_plain(self) -> None:
+        with Dat.open(self.dat_file_path) as dat:
+            self.run_threads(dat)
+
+    def test_without_pread(self) -> None:
+        """ Platforms without os.pread seek the shared file under a lock """
+
+        with Dat.open(self.dat_file_path) as dat:
+            dat.has_pread = False
+            self.run_threads(dat)
+
+    def test_mmap(self) -> None:
+        with Dat.open(self.dat_file_path, use_mmap=True) as dat:
+            self.run_threads(dat)
+
+    def test_cached(self) -> None:
+        with Dat.open(self.dat_file_path, cache_size=1024 * 1024, cache_pin_size=1024) as dat:
+            self.run_threads(dat)
+            self.assertGreater(dat.cache.hits, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,22 +1,32 @@
 import argparse
 
 from os import path
+import json
 import os
+import shutil
+import sys
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from glob import glob
 
-from typing import List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
 
-from formats.dat import Dat
+from formats.dat import Dat, DatEntry, DatEntryReader
+from formats.resources import DatLayout
 
 
 class Constants(object):
 
-    modules_folder = "modules"
+    modules_folder = DatLayout.modules_folder
     data_folder = "data"
 
-    main_dat_names_template = "arcanum*.dat"
-    module_dat_names_template = "*.dat"
-    module_patch_dat_names_template = "*.patch*"
+    main_dat_names_template = DatLayout.main_dat_names_template
+    module_dat_names_template = DatLayout.module_dat_names_template
+    module_patch_dat_names_template = DatLayout.module_patch_dat_names_template
 
     arcanum_module_cased_name = "Arcanum"
     arcanum_module_lower_name = arcanum_module_cased_name.lower()
@@ -55,37 +65,525 @@ def get_dat_output_directory(dat_file_path: str, base_output_directory: str) ->
     return path.join(base_output_directory, dat_output_folder)
 
 
-def extract_dat_file(dat_file_path: str, base_output_directory: str, list_only: bool, no_overwrite: bool) -> None:
+class ExtractionManifest(object):
+    """
+    Remembers for every extracted file the dat it was extracted from (guid, size and modification time), the location
+    and sizes of its entry and a checksum of its data, so that extracting again can skip the entries of dats that did
+    not change without reading them.
+    Only the size of existing output files is trusted, unless 'verify_output' is given, in which case their checksum
+    is compared as well, so that locally modified files of the same size are extracted again.
+    It is saved as a json file in the output directory of the dat.
+    """
+
+    file_name = ".undat-manifest.json"
+
+    def __init__(self, manifest_file_path: str, records: Dict[str, dict], verify_output: bool=False):
+
+        self.manifest_file_path = manifest_file_path
+        self.records = records
+        self.verify_output = verify_output
+
+    @classmethod
+    def load(cls, output_directory: str, verify_output: bool=False) -> "ExtractionManifest":
+
+        manifest_file_path = path.join(output_directory, cls.file_name)
+
+        try:
+            with open(manifest_file_path, "r") as manifest_file:
+                records = json.load(manifest_file)
+        except (OSError, ValueError):
+            records = {}
+
+        return ExtractionManifest(manifest_file_path=manifest_file_path, records=records, verify_output=verify_output)
+
+    def save(self) -> None:
+
+        os.makedirs(path.dirname(self.manifest_file_path) or ".", exist_ok=True)
+
+        temporary_file_path = self.manifest_file_path + ".tmp"
+
+        with open(temporary_file_path, "w") as manifest_file:
+            json.dump(self.records, manifest_file, indent=1, sort_keys=True)
+
+        os.replace(temporary_file_path, self.manifest_file_path)
+
+    def _get_record_key(self, key_output_path: str) -> str:
+        return path.relpath(get_output_path_key(key_output_path),
+                            get_output_path_key(path.dirname(self.manifest_file_path)))
+
+    @staticmethod
+    def _get_source(dat: Dat, entry: DatEntry) -> dict:
+
+        dat_stat = os.fstat(dat.dat_file.fileno())
+
+        return {
+            "guid": dat.footer.guid.hex(),
+            "dat_size": dat_stat.st_size,
+            "dat_mtime": dat_stat.st_mtime_ns,
+            "location": entry.location,
+            "compressed_size": entry.compressed_size,
+            "full_size": entry.full_size,
+        }
+
+    def is_up_to_date(self, key_output_path: str, dat: Dat, entry: DatEntry) -> bool:
+
+        record = self.records.get(self._get_record_key(key_output_path))
+        if record is None:
+            return False
+
+        source = self._get_source(dat, entry)
+        if any(record.get(field) != value for field, value in source.items()):
+            return False
+
+        try:
+            if path.getsize(key_output_path) != entry.full_size:
+                return False
+
+            return not self.verify_output or self.get_file_crc32(key_output_path) == record.get("crc32")
+
+        except OSError:
+            return False
+
+    @staticmethod
+    def get_file_crc32(file_path: str, chunk_size: int=1024 * 1024) -> int:
+
+        crc32 = 0
+
+        with open(file_path, "rb") as input_file:
+            for chunk in iter(lambda: input_file.read(chunk_size), b""):
+                crc32 = zlib.crc32(chunk, crc32)
+
+        return crc32
+
+    def record(self, key_output_path: str, dat: Dat, entry: DatEntry, output_data: bytes) -> None:
+
+        record = self._get_source(dat, entry)
+        record["crc32"] = zlib.crc32(output_data)
+
+        self.records[self._get_record_key(key_output_path)] = record
+
+
+def get_output_path_key(output_path: str) -> str:
+    """ Output paths that name the same file (e.g. with a different case on Windows) have the same key """
+
+    return path.normcase(path.normpath(output_path))
+
+
+def get_extraction_plan(dat_file_paths: List[str], dats: List[Dat],
+                        base_output_directory: str) -> List[Dict[str, str]]:
+    """
+    Returns the keys to extract from every dat and their output paths.
+    Later dats (e.g. patches) override the files of former ones, so every output file is only extracted from the
+    last dat that contains it.
+    """
+
+    # Keyed by get_output_path_key, so that the later dat wins even if the names differ in case
+    output_path_to_source = {}  # type: Dict[str, Tuple[int, str, str]]
+
+    for dat_index, (dat_file_path, dat) in enumerate(zip(dat_file_paths, dats)):
+
+        output_directory = get_dat_output_directory(dat_file_path=dat_file_path,
+                                                    base_output_directory=base_output_directory)
+
+        for key in dat.keys():
+            key_output_path = path.join(output_directory, key.replace('\\', os.sep))
+            output_path_to_source[get_output_path_key(key_output_path)] = (dat_index, key, key_output_path)
+
+    plan = [{} for _ in dats]  # type: List[Dict[str, str]]
+
+    for dat_index, key, key_output_path in output_path_to_source.values():
+        plan[dat_index][key] = key_output_path
+
+    return plan
+
+
+def extract_dat_file(dat_file_path: str, base_output_directory: str, list_only: bool, no_overwrite: bool,
+                     incremental: bool=False, key_to_output_path: Dict[str, str]=None,
+                     verify_output: bool=False) -> None:
+    """
+    When 'key_to_output_path' is given only those keys are extracted (see get_extraction_plan).
+    When 'incremental' is given the entries that did not change since the last extraction are skipped (see
+    ExtractionManifest, 'verify_output' checks the checksums of the existing output files too).
+    """
 
     output_directory = get_dat_output_directory(dat_file_path=dat_file_path,
                                                 base_output_directory=base_output_directory)
 
     dat = Dat.open(dat_file_path=dat_file_path)
 
+    manifest = (ExtractionManifest.load(output_directory, verify_output=verify_output)
+                if incremental and not list_only else None)
+
     for key in dat.keys():
 
         if list_only:
             print("\t%s" % key)
             continue
 
-        key_output_path = path.join(output_directory, key.replace('\\', os.sep))
+        if key_to_output_path is None:
+            key_output_path = path.join(output_directory, key.replace('\\', os.sep))
+        elif key in key_to_output_path:
+            key_output_path = key_to_output_path[key]
+        else:
+            continue
+
         key_output_directory = path.dirname(key_output_path)
 
         if not path.exists(key_output_directory):
             os.makedirs(key_output_directory)
 
-        output_data = dat[key]
-        if not output_data:
+        entry = dat.name_to_entry[key]
+        if entry.is_directory or not entry.full_size:
             continue
 
+        # Checked before reading the entry, so skipped entries are never read or inflated
         if no_overwrite and path.exists(key_output_path):
             continue
 
+        if manifest is not None and manifest.is_up_to_date(key_output_path, dat=dat, entry=entry):
+            continue
+
+        output_data = dat[key]
+
         print("\tExtracting '%s' to '%s'..." % (key, key_output_path))
 
         with open(key_output_path, "wb") as output_file:
             output_file.write(output_data)
 
+        if manifest is not None:
+            manifest.record(key_output_path, dat=dat, entry=entry, output_data=output_data)
+
+    if manifest is not None:
+        manifest.save()
+
+    dat.close()
+
+
+def write_output_file(key: str, key_output_path: str, entry: DatEntry, raw_data: bytes) -> bytes:
+
+    output_data = zlib.decompress(raw_data) if entry.is_compressed else raw_data
+
+    print("\tExtracting '%s' to '%s'..." % (key, key_output_path))
+
+    with open(key_output_path, "wb") as output_file:
+        output_file.write(output_data)
+
+    return output_data
+
+
+def process_dat_entries_in_parallel(dats: List[Dat], jobs: int,
+                                    yield_entries: Callable[[int], Iterable[Tuple[str, DatEntry, Any]]],
+                                    process_entry: Callable[[int, str, DatEntry, bytes, Any], None]) -> None:
+    """
+    Every dat is read by its own thread, in the order of the entries that 'yield_entries' yields for the dat index
+    (which should be their location, so that the reads are sequential), while the raw data of the entries is given to
+    'process_entry' on a pool of 'jobs' workers (inflating should be done there, zlib releases the GIL).
+    Whatever 'yield_entries' yields after the entry is given to 'process_entry' as well.
+    """
+
+    # Bounds the amount of read but not yet processed data
+    pending_slots = threading.BoundedSemaphore(jobs * 4)
+
+    with ThreadPoolExecutor(max_workers=jobs) as workers:
+
+        def run_process_entry(dat_index: int, key: str, entry: DatEntry, raw_data: bytes, context: Any) -> None:
+            try:
+                process_entry(dat_index, key, entry, raw_data, context)
+            finally:
+                pending_slots.release()
+
+        def read_dat(dat_index: int) -> None:
+
+            dat = dats[dat_index]
+            futures = []
+
+            for key, entry, context in yield_entries(dat_index):
+
+                pending_slots.acquire()
+                raw_data = dat.read_raw(key)
+
+                futures.append(workers.submit(run_process_entry, dat_index, key, entry, raw_data, context))
+
+            for future in futures:
+                future.result()
+
+        with ThreadPoolExecutor(max_workers=min(jobs, len(dats)) or 1) as readers:
+            for future in [readers.submit(read_dat, dat_index) for dat_index in range(len(dats))]:
+                future.result()
+
+
+def extract_dat_files_in_parallel(dat_file_paths: List[str], base_output_directory: str, no_overwrite: bool,
+                                  jobs: int, incremental: bool=False, verify_output: bool=False) -> None:
+    """
+    Extracts all the dat files at once, every dat is read by its own thread in the order the entries are located in
+    the file (so the reads are sequential), while decompressing and writing is done by a pool of 'jobs' workers
+    (zlib releases the GIL).
+    """
+
+    dats = [Dat.open(dat_file_path=dat_file_path) for dat_file_path in dat_file_paths]
+
+    # Every output file is extracted from a single dat, this way the dats can be extracted concurrently.
+    plan = get_extraction_plan(dat_file_paths=dat_file_paths, dats=dats, base_output_directory=base_output_directory)
+
+    output_directory_to_manifest = {}  # type: Dict[str, ExtractionManifest]
+    dat_manifests = []  # type: List[ExtractionManifest]
+
+    for dat_file_path in dat_file_paths:
+
+        if not incremental:
+            dat_manifests.append(None)
+            continue
+
+        output_directory = get_dat_output_directory(dat_file_path=dat_file_path,
+                                                    base_output_directory=base_output_directory)
+
+        if output_directory not in output_directory_to_manifest:
+            output_directory_to_manifest[output_directory] = ExtractionManifest.load(output_directory,
+                                                                                     verify_output=verify_output)
+
+        dat_manifests.append(output_directory_to_manifest[output_directory])
+
+    def yield_entries(dat_index: int) -> Iterator[Tuple[str, DatEntry, str]]:
+
+        dat = dats[dat_index]
+        key_to_output_path = plan[dat_index]
+        manifest = dat_manifests[dat_index]
+
+        for key in dat.keys_by_location():
+
+            key_output_path = key_to_output_path.get(key)
+            if key_output_path is None:
+                continue
+
+            os.makedirs(path.dirname(key_output_path), exist_ok=True)
+
+            entry = dat.name_to_entry[key]
+            if entry.is_directory or not entry.full_size:
+                continue
+
+            if no_overwrite and path.exists(key_output_path):
+                continue
+
+            if manifest is not None and manifest.is_up_to_date(key_output_path, dat=dat, entry=entry):
+                continue
+
+            yield key, entry, key_output_path
+
+    def extract_entry(dat_index: int, key: str, entry: DatEntry, raw_data: bytes, key_output_path: str) -> None:
+
+        output_data = write_output_file(key=key, key_output_path=key_output_path, entry=entry, raw_data=raw_data)
+
+        manifest = dat_manifests[dat_index]
+        if manifest is not None:
+            manifest.record(key_output_path, dat=dats[dat_index], entry=entry, output_data=output_data)
+
+    process_dat_entries_in_parallel(dats=dats, jobs=jobs, yield_entries=yield_entries, process_entry=extract_entry)
+
+    for manifest in output_directory_to_manifest.values():
+        manifest.save()
+
+    for dat in dats:
+        dat.close()
+
+
+class VerificationReport(object):
+    """ Collects the results of verifying the entries of a single dat """
+
+    slowest_entries_count = 5
+
+    def __init__(self, dat_file_path: str):
+
+        self.dat_file_path = dat_file_path
+
+        self.entries = 0
+        self.compressed_size = 0
+        self.full_size = 0
+
+        self.errors = []  # type: List[Tuple[str, str]]
+        self.entry_durations = []  # type: List[Tuple[float, str]]
+
+        self.start_time = time.perf_counter()
+        self.end_time = self.start_time
+
+        self.lock = threading.Lock()
+
+    def add(self, key: str, entry: DatEntry, error: str, duration: float) -> None:
+
+        with self.lock:
+
+            self.entries += 1
+            self.compressed_size += entry.compressed_size
+            self.full_size += entry.full_size
+
+            if error:
+                self.errors.append((key, error))
+
+            self.entry_durations.append((duration, key))
+
+            self.end_time = time.perf_counter()
+
+    def print_summary(self) -> None:
+
+        megabytes = self.full_size / (1024 * 1024)
+        elapsed_time = max(self.end_time - self.start_time, 1e-9)
+        ratio = self.compressed_size / self.full_size if self.full_size else 1.0
+
+        print("'%s': %d entries, %.1f MB in %.2f seconds (%.1f MB/s), compression ratio %.3f, %d errors" %
+              (self.dat_file_path, self.entries, megabytes, elapsed_time, megabytes / elapsed_time, ratio,
+               len(self.errors)))
+
+        for duration, key in sorted(self.entry_durations, reverse=True)[:self.slowest_entries_count]:
+            print("\tSlow entry '%s' (%.1f ms)" % (key, duration * 1000))
+
+        for key, error in self.errors:
+            print("\tBad entry '%s': %s" % (key, error))
+
+
+def verify_entry(entry: DatEntry, raw_data: bytes, data_end: int) -> str:
+    """ Inflates the entry and returns a description of what is wrong with it, or an empty string if nothing is """
+
+    if entry.location + entry.compressed_size > data_end or len(raw_data) != entry.compressed_size:
+        return "data exceeds the data section of the file"
+
+    if not entry.is_compressed:
+        if entry.compressed_size != entry.full_size:
+            return "uncompressed entry has a compressed size of %d but a full size of %d" % (entry.compressed_size,
+                                                                                            entry.full_size)
+        return ""
+
+    decompressor = zlib.decompressobj()
+
+    try:
+        data_size = len(decompressor.decompress(raw_data)) + len(decompressor.flush())
+    except zlib.error as error:
+        return "bad zlib data (%s)" % error
+
+    if not decompressor.eof:
+        return "truncated zlib data"
+
+    if decompressor.unused_data:
+        return "%d bytes after the end of the zlib data" % len(decompressor.unused_data)
+
+    if data_size != entry.full_size:
+        return "inflated to %d bytes instead of %d" % (data_size, entry.full_size)
+
+    return ""
+
+
+def verify_dat_files(dat_file_paths: List[str], jobs: int) -> bool:
+    """
+    Inflates every entry of every dat (all at once, on a pool of 'jobs' workers) without writing anything, and prints
+    the throughput, compression ratio, slowest entries and errors of every dat.
+    Returns whether all the entries are valid.
+    """
+
+    dats = [Dat.open(dat_file_path=dat_file_path) for dat_file_path in dat_file_paths]
+    reports = [VerificationReport(dat_file_path=dat_file_path) for dat_file_path in dat_file_paths]
+
+    # The entries table (and the footer) follows the data of the entries
+    data_ends = [os.fstat(dat.dat_file.fileno()).st_size - dat.footer.footer_plus_entries_size for dat in dats]
+
+    def yield_entries(dat_index: int) -> Iterator[Tuple[str, DatEntry, None]]:
+
+        dat = dats[dat_index]
+
+        for key in dat.keys_by_location():
+
+            entry = dat.name_to_entry[key]
+
+            if not entry.is_directory:
+                yield key, entry, None
+
+    def verify(dat_index: int, key: str, entry: DatEntry, raw_data: bytes, _) -> None:
+
+        start_time = time.perf_counter()
+        error = verify_entry(entry=entry, raw_data=raw_data, data_end=data_ends[dat_index])
+
+        reports[dat_index].add(key=key, entry=entry, error=error, duration=time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+
+    process_dat_entries_in_parallel(dats=dats, jobs=jobs, yield_entries=yield_entries, process_entry=verify)
+
+    elapsed_time = max(time.perf_counter() - start_time, 1e-9)
+
+    for report in reports:
+        report.print_summary()
+
+    megabytes = sum(report.full_size for report in reports) / (1024 * 1024)
+    errors = sum(len(report.errors) for report in reports)
+
+    print("Verified %d dat files, %.1f MB in %.2f seconds (%.1f MB/s), %d errors" %
+          (len(dats), megabytes, elapsed_time, megabytes / elapsed_time, errors))
+
+    for dat in dats:
+        dat.close()
+
+    return not errors
+
+
+def extract_dat_files_to_archive(dat_file_paths: List[str], output_path: str, output_format: str) -> None:
+    """
+    Streams the entries of all the dats straight into a tar or zip file (or to stdout if the output path is '-'),
+    entries are inflated incrementally so only a small part of an entry is held in memory at once.
+    The member names retain the arcanum path conventions (e.g. "data/..." and "modules/Arcanum/...").
+    """
+
+    dats = [Dat.open(dat_file_path=dat_file_path) for dat_file_path in dat_file_paths]
+
+    plan = get_extraction_plan(dat_file_paths=dat_file_paths, dats=dats, base_output_directory=".")
+
+    output_file = sys.stdout.buffer if output_path == "-" else open(output_path, "wb")
+
+    if output_format == "tar":
+        # A stream (rather than a seekable file) is expected, so that stdout works as well.
+        archive = tarfile.open(fileobj=output_file, mode="w|")
+    else:
+        archive = zipfile.ZipFile(output_file, mode="w", compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+
+    with archive:
+
+        for dat, key_to_output_path in zip(dats, plan):
+
+            mtime = os.fstat(dat.dat_file.fileno()).st_mtime
+
+            for key in dat.keys_by_location():
+
+                key_output_path = key_to_output_path.get(key)
+                if key_output_path is None:
+                    continue
+
+                entry = dat.name_to_entry[key]
+                if entry.is_directory:
+                    continue
+
+                member_name = path.normpath(key_output_path).replace(os.sep, "/")
+
+                # Printed to stderr, since stdout might be the archive itself
+                print("\tArchiving '%s' as '%s'..." % (key, member_name), file=sys.stderr)
+
+                with dat.open_entry(key) as entry_file:
+
+                    if output_format == "tar":
+                        member_info = tarfile.TarInfo(name=member_name)
+                        member_info.size = entry.full_size
+                        member_info.mtime = mtime
+                        archive.addfile(member_info, entry_file)
+
+                    else:
+                        member_info = zipfile.ZipInfo(filename=member_name, date_time=time.localtime(mtime)[:6])
+                        member_info.compress_type = zipfile.ZIP_DEFLATED
+                        with archive.open(member_info, mode="w", force_zip64=True) as member_file:
+                            shutil.copyfileobj(entry_file, member_file, DatEntryReader.chunk_size)
+
+    if output_file is not sys.stdout.buffer:
+        output_file.close()
+    else:
+        output_file.flush()
+
+    for dat in dats:
+        dat.close()
+
 
 def get_dat_paths(arcanum_directory: str) -> List[str]:
 
@@ -95,31 +593,84 @@ def get_dat_paths(arcanum_directory: str) -> List[str]:
     modules_main_dat_paths_template = path.join(modules_directory, Constants.module_dat_names_template)
     modules_patch_dat_paths_template = path.join(modules_directory, Constants.module_patch_dat_names_template)
 
+    # Sorted so that later dats (e.g. 'arcanum2.dat' or '*.patch10') always come after the ones they override.
     return (
-        glob(main_dat_paths_template) + glob(modules_main_dat_paths_template) + glob(modules_patch_dat_paths_template)
+        DatLayout.sort_dat_paths(glob(main_dat_paths_template)) +
+        DatLayout.sort_dat_paths(glob(modules_main_dat_paths_template)) +
+        DatLayout.sort_dat_paths(glob(modules_patch_dat_paths_template))
     )
 
 
-def main(input_path: str, output_directory: str, list_only: bool, no_overwrite: bool, delete_dat: bool) -> None:
+def main(input_path: str, output_directory: str, list_only: bool, no_overwrite: bool, delete_dat: bool,
+         jobs: int=1, incremental: bool=False, output_format: str="", verify: bool=False,
+         verify_output: bool=False) -> bool:
 
     if path.isdir(input_path):
         dat_file_paths = get_dat_paths(input_path)
     else:
         dat_file_paths = [input_path]
 
+    if verify:
+
+        print("Verifying %s..." % ", ".join("'%s'" % dat_file_path for dat_file_path in dat_file_paths))
+
+        return verify_dat_files(dat_file_paths=dat_file_paths, jobs=jobs)
+
+    if output_format and not list_only:
+
+        print("Archiving %s..." % ", ".join("'%s'" % dat_file_path for dat_file_path in dat_file_paths),
+              file=sys.stderr)
+
+        extract_dat_files_to_archive(dat_file_paths=dat_file_paths, output_path=output_directory or "-",
+                                     output_format=output_format)
+
+        if delete_dat:
+            for dat_file_path in dat_file_paths:
+                os.remove(dat_file_path)
+                print("Deleting '%s'..." % dat_file_path, file=sys.stderr)
+
+        return True
+
+    if jobs > 1 and not list_only:
+
+        print("Extracting %s..." % ", ".join("'%s'" % dat_file_path for dat_file_path in dat_file_paths))
+
+        extract_dat_files_in_parallel(dat_file_paths=dat_file_paths, base_output_directory=output_directory,
+                                      no_overwrite=no_overwrite, jobs=jobs, incremental=incremental,
+                                      verify_output=verify_output)
+
+        if delete_dat:
+            for dat_file_path in dat_file_paths:
+                os.remove(dat_file_path)
+                print("Deleting '%s'..." % dat_file_path)
+
+        return True
+
     action = "Listing" if list_only else "Extracting"
 
-    for dat_file_path in dat_file_paths:
+    # Incremental extractions must not rewrite files that later dats override, or they would never be up to date.
+    if incremental and not list_only:
+        dats = [Dat.open(dat_file_path=dat_file_path) for dat_file_path in dat_file_paths]
+        plan = get_extraction_plan(dat_file_paths=dat_file_paths, dats=dats, base_output_directory=output_directory)
+        for dat in dats:
+            dat.close()
+    else:
+        plan = [None] * len(dat_file_paths)
+
+    for dat_file_path, key_to_output_path in zip(dat_file_paths, plan):
 
         print("%s '%s'..." % (action, dat_file_path))
 
         extract_dat_file(dat_file_path=dat_file_path, base_output_directory=output_directory,
-                         list_only=list_only, no_overwrite=no_overwrite)
+                         list_only=list_only, no_overwrite=no_overwrite, incremental=incremental,
+                         key_to_output_path=key_to_output_path, verify_output=verify_output)
 
         if delete_dat:
             os.remove(dat_file_path)
             print("Deleting '%s'..." % dat_file_path)
 
+    return True
+
 
 if __name__ == "__main__":
 
@@ -138,8 +689,30 @@ if __name__ == "__main__":
                         action='store_true', default=False)
     parser.add_argument('--delete-dat', help='Delete the dat file after extracting or listing',
                         action='store_true', default=False)
+    parser.add_argument('--jobs', '-j', help='Number of worker threads, when more than 1 all the dat files are '
+                                             'extracted at once',
+                        type=int, default=1)
+    parser.add_argument('--incremental', '-i', help='Skip files that did not change since the last extraction, '
+                                                    'according to the manifest saved in the output folders',
+                        action='store_true', default=False)
+    parser.add_argument('--output-format', help='Stream the files into a single tar or zip file instead of a folder, '
+                                                'in which case the output path is the archive file path '
+                                                '(or "-" for stdout, the default)',
+                        choices=('tar', 'zip'), default='')
+    parser.add_argument('--verify', help='Only inflate and check all the entries of the dat files (on "--jobs" '
+                                         'workers) and report statistics, nothing is written',
+                        action='store_true', default=False)
+    parser.add_argument('--verify-output', help='When extracting incrementally, also compare the checksums of the '
+                                                'existing output files to the manifest (and not only their sizes), '
+                                                'so that locally modified files are extracted again',
+                        action='store_true', default=False)
 
     arguments = parser.parse_args()
 
-    main(input_path=arguments.input_path, output_directory=arguments.output_path,
-         list_only=arguments.list_only, no_overwrite=arguments.no_overwrite, delete_dat=arguments.delete_dat)
+    success = main(input_path=arguments.input_path, output_directory=arguments.output_path,
+                   list_only=arguments.list_only, no_overwrite=arguments.no_overwrite,
+                   delete_dat=arguments.delete_dat, jobs=arguments.jobs, incremental=arguments.incremental,
+                   output_format=arguments.output_format, verify=arguments.verify,
+                   verify_output=arguments.verify_output)
+
+    sys.exit(0 if success else 1)